@@ -0,0 +1,141 @@
+"""
+toolboks - Lightweight library & utility tools
+
+Copyright (C) 2022 Mikael Tranbom
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from functools import partial
+
+# Benchmarks for toolboks.config
+# Run from the repository root: python -m benchmarks.bench_config
+
+STARTUP = (
+    "import sys, time; start = time.perf_counter();"
+    "from toolboks.config import read_config;"
+    "read_config(sys.argv[1], snapshot=sys.argv[2] == '1');"
+    "print(time.perf_counter() - start)"
+)
+
+
+def write_config(path: str, sections: int, options: int):
+    """Write an INI file with `sections` sections of `options` options each"""
+    with open(path, 'w', encoding='utf-8') as config_file:
+        for section in range(sections):
+            config_file.write(f'[section_{section}]\n')
+            for option in range(options):
+                config_file.write(f'option_{option} = value {section} {option}\n')
+
+
+def startup(path: str, snapshot: bool, environment: dict) -> float:
+    """Return the seconds a new process needs to import toolboks and read `path`"""
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP, path, '1' if snapshot else '0'],
+        env=environment, capture_output=True, check=True, text=True
+    )
+    return float(result.stdout)
+
+
+def bench_snapshot(repeat: int = 5):
+    """Compare cold parsing with loading a snapshot in new processes"""
+    print("read_config() in a new process: cold parse vs snapshot")
+    print(
+        f"{'sections':>8} {'options':>8} {'cold':>10} {'snapshot':>10} "
+        f"{'speedup':>8}"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        environment = {
+            **os.environ,
+            'XDG_CACHE_HOME': os.path.join(directory, 'cache'),
+            'PYTHONPATH': os.getcwd(),
+        }
+
+        for sections, options in ((10, 10), (500, 20), (5_000, 20), (20_000, 10)):
+            path = os.path.join(directory, f'{sections}_{options}.ini')
+            write_config(path, sections, options)
+            # write the snapshot before timing
+            startup(path, True, environment)
+
+            cold = min(startup(path, False, environment) for _ in range(repeat))
+            snapshot = min(startup(path, True, environment) for _ in range(repeat))
+            print(
+                f"{sections:>8} {options:>8} {cold:>10.4f} {snapshot:>10.4f} "
+                f"{cold / snapshot:>8.2f}"
+            )
+
+
+def bench_snapshot_in_process(repeat: int = 5):
+    """Compare configparser with loading the snapshot, without the import cost"""
+    # pylint: disable=import-outside-toplevel,protected-access
+    from toolboks import config
+
+    print("read_config() parse vs snapshot load, seconds per call")
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['XDG_CACHE_HOME'] = os.path.join(directory, 'cache')
+        path = os.path.join(directory, 'large.ini')
+        write_config(path, 5_000, 20)
+        config.read_config(path, snapshot=True)
+        signature = config._stat(path)[1]
+
+        parse = min(timeit.repeat(
+            partial(config._parse, path), number=1, repeat=repeat
+        ))
+        load = min(timeit.repeat(
+            partial(config._read_snapshot, path, signature), number=1, repeat=repeat
+        ))
+        print(f"{'parse':>10} {parse:>10.4f}\n{'snapshot':>10} {load:>10.4f}")
+
+
+def bench_memory(tenants: int = 2_000):
+    """Compare the memory of many parsed configurations held at once"""
+    # pylint: disable=import-outside-toplevel
+    from toolboks.config import cache_clear, read_config
+
+    print(f"memory of {tenants} configurations (8 sections x 12 options)")
+    print(f"{'representation':>16} {'KiB':>10} {'bytes/config':>13}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+
+        for tenant in range(tenants):
+            path = os.path.join(directory, f'tenant_{tenant}.ini')
+            write_config(path, 8, 12)
+            paths.append(path)
+
+        for name, options in (
+            ('SimpleNamespace', {}),
+            ('dict', {'as_dict': True}),
+            ('frozen', {'frozen': True}),
+        ):
+            # measure the returned objects, not the parse cache
+            cache_clear()
+            tracemalloc.start()
+            configs = [read_config(path, cache=False, **options) for path in paths]
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del configs
+            print(f"{name:>16} {size / 1024:>10.0f} {size / tenants:>13.0f}")
+
+
+if __name__ == '__main__':
+    bench_snapshot()
+    bench_snapshot_in_process()
+    bench_memory()
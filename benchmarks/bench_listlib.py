@@ -0,0 +1,186 @@
+"""
+toolboks - Lightweight library & utility tools
+
+Copyright (C) 2022 Mikael Tranbom
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import array
+import os
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from toolboks.listlib import ITERABLE_TYPES, expand, expand_array, profile
+
+# Benchmarks for toolboks.listlib
+# Run from the repository root: python -m benchmarks.bench_listlib
+
+
+def nested(total: int, depth: int) -> list:
+    """Build a list `depth` levels deep with `total` leaves spread over the levels"""
+    per_level = max(total // depth, 1)
+    data = list(range(per_level))
+
+    for _ in range(depth - 1):
+        data = [*range(per_level), data]
+
+    return data
+
+
+def baseline_expand(nested_list: list, depth: int = -1) -> list:
+    """The recursive expand() of toolboks 0.x, kept as a reference point"""
+    expanded_list = []
+
+    for entry in nested_list:
+        if isinstance(entry, list):
+            if depth == -1:
+                expanded_list.extend(baseline_expand(entry))
+            elif depth > 0:
+                expanded_list.extend(baseline_expand(entry, depth - 1))
+            else:
+                expanded_list.append(entry)
+        else:
+            expanded_list.append(entry)
+
+    return expanded_list
+
+
+def best_of(func, repeat: int) -> float:
+    """Return the fastest of `repeat` single calls to `func` in seconds"""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def bench_expand_scaling(repeat: int = 5):
+    """Time expand() over inputs of growing size and depth"""
+    print("expand(): seconds per call")
+    print(f"{'leaves':>10} {'depth':>6} {'seconds':>10} {'ns/leaf':>8}")
+
+    for total in (10_000, 100_000, 1_000_000):
+        for depth in (1, 10, 100, 2_000):
+            data = nested(total, depth)
+            seconds = best_of(partial(expand, data), repeat)
+            per_leaf = seconds / total * 1e9
+            print(f"{total:>10} {depth:>6} {seconds:>10.5f} {per_leaf:>8.1f}")
+
+
+def bench_baseline(repeat: int = 5):
+    """Compare expand() with the default options to the recursive baseline"""
+    print(f"\n{'input':<26} {'baseline s':>10} {'expand s':>10} {'ratio':>8}")
+
+    for name, data in (
+        ('1M flat ints', list(range(1_000_000))),
+        ('300k [i, [i, i]] entries', [[i, [i, i]] for i in range(300_000)]),
+        ('1M leaves, depth 100', nested(1_000_000, 100)),
+    ):
+        baseline = best_of(partial(baseline_expand, data), repeat)
+        seconds = best_of(partial(expand, data), repeat)
+        ratio = seconds / baseline
+        print(f"{name:<26} {baseline:>10.4f} {seconds:>10.4f} {ratio:>8.2f}")
+
+
+def bench_buffers(repeat: int = 5):
+    """Compare list and typed array output for batches of numeric buffers"""
+    batches = [array.array('d', range(100_000)) for _ in range(100)]
+    total = sum(len(batch) for batch in batches)
+
+    print(f"\nflattening {len(batches)} array.array('d') batches, {total} floats")
+
+    for name, func in (
+        ('expand(buffers=True)', partial(expand, batches, buffers=True)),
+        ('expand_array()', partial(expand_array, batches)),
+    ):
+        seconds = best_of(func, repeat)
+        print(f"{name:<22} {seconds:>10.5f} s {seconds / total * 1e9:>8.2f} ns/float")
+
+
+def bench_mixed_types(repeat: int = 5):
+    """Time expand() over leaves of many different types"""
+    leaf_types = [1, 1.5, 'text', b'bytes', None, True, 1j, object(), range(1)]
+    data = [[leaf_types, tuple(leaf_types)] for _ in range(20_000)]
+
+    print(f"\nexpanding leaves of {len(leaf_types)} different types")
+
+    for name, func in (
+        ('containers=(list,)', partial(expand, data)),
+        ('ITERABLE_TYPES', partial(expand, data, containers=ITERABLE_TYPES)),
+    ):
+        total = len(func())
+        seconds = best_of(func, repeat)
+        print(f"{name:<22} {seconds:>10.5f} s {seconds / total * 1e9:>8.2f} ns/leaf")
+
+
+def bench_shared(repeat: int = 5):
+    """Compare walking a shared sublist per reference with reusing it"""
+    shared = nested(10_000, 10)
+    data = [shared] * 100
+    total = len(expand(data))
+
+    print(f"\nexpanding one shared sublist referenced {len(data)} times")
+
+    for policy in ('expand', 'reuse'):
+        seconds = best_of(partial(expand, data, shared=policy), repeat)
+        name = f"shared={policy!r}"
+        print(f"{name:<22} {seconds:>10.5f} s {seconds / total * 1e9:>8.2f} ns/leaf")
+
+
+def bench_profile(repeat: int = 5):
+    """Compare expand() with and without a reused profile of the batch shape"""
+    batch = nested(1_000_000, 100)
+    shape = profile(batch)
+
+    print(f"\nexpanding a batch of {shape.leaf_count} leaves with a reused profile")
+
+    for name, func in (
+        ('expand()', partial(expand, batch)),
+        ('expand(profile=...)', partial(expand, batch, profile=shape)),
+        ('profile()', partial(profile, batch)),
+    ):
+        seconds = best_of(func, repeat)
+        print(f"{name:<22} {seconds:>10.5f} s")
+
+
+def bench_parallel(repeat: int = 3):
+    """
+    Compare serial and parallel expand() over growing top-level lists to find
+    the crossover point. The pool is created once, so only the per-call cost
+    of chunking, pickling and joining is measured.
+    """
+    workers = os.cpu_count() or 1
+    entry = [1, [2.5, 'text', [3, [4, 5]]], 6]
+
+    print(f"\nparallel expand() with {workers} worker processes")
+    print(f"{'entries':>10} {'serial s':>10} {'parallel s':>10} {'speedup':>8}")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # start the worker processes before timing
+        expand([entry] * 100_000, executor=pool)
+
+        for total in (50_000, 200_000, 1_000_000, 4_000_000):
+            data = [list(entry) for _ in range(total)]
+            serial = best_of(partial(expand, data), repeat)
+            parallel = best_of(partial(expand, data, executor=pool), repeat)
+            print(
+                f"{total:>10} {serial:>10.4f} {parallel:>10.4f} "
+                f"{serial / parallel:>8.2f}"
+            )
+
+
+if __name__ == '__main__':
+    bench_expand_scaling()
+    bench_baseline()
+    bench_buffers()
+    bench_mixed_types()
+    bench_shared()
+    bench_profile()
+    bench_parallel()
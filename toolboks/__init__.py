@@ -15,22 +15,72 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import os as _os
+from importlib import import_module as _import_module
+
 from toolboks._version import __version__  # noqa: F401
 
-from toolboks.config import (  # noqa: F401
-    read_config
-)
+# Names exported by the package and the module they are imported from.
+# Modules are imported on first access (see __getattr__), so `import toolboks`
+# stays fast for tools that only use a part of the library.
+_EXPORTS = {
+    'read_config': 'config',
+
+    'CYCLE': 'listlib',
+    'ITERABLE_TYPES': 'listlib',
+    'CycleError': 'listlib',
+    'NestingProfile': 'listlib',
+    'expand': 'listlib',
+    'expand_array': 'listlib',
+    'flatten': 'listlib',
+    'flatten_array': 'listlib',
+    'flatten_unique': 'listlib',
+    'flatten_with_spec': 'listlib',
+    'iexpand': 'listlib',
+    'iflatten': 'listlib',
+    'iflatten_unique': 'listlib',
+    'profile': 'listlib',
+    'unflatten': 'listlib',
+
+    'filter_abs_path': 'modifiers',
+
+    'context': 'system',
+    'getenv': 'system',
+    'getenv_bool': 'system',
+    'getenv_bytes': 'system',
+    'getenv_duration': 'system',
+    'getenv_int': 'system',
+    'getenv_list': 'system',
+    'getenv_many': 'system',
+}
+
+# Submodules, also imported on first access as attributes of the package
+_SUBMODULES = ('config', 'listlib', 'modifiers', 'system', 'xdg', 'perf')
+
+__all__ = ['__version__', *_EXPORTS]
+
+
+def __getattr__(name: str):
+    """Import the module of an exported name or a submodule on first access"""
+    if name in _SUBMODULES:
+        return _import_module(f'toolboks.{name}')
+
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value = getattr(_import_module(f'toolboks.{module}'), name)
+    globals()[name] = value
+
+    return value
+
 
-from toolboks.listlib import (  # noqa: F401
-    expand,
-    flatten,
-)
+def __dir__():
+    return sorted({*globals(), *_EXPORTS, *_SUBMODULES})
 
-from toolboks.modifiers import (  # noqa: F401
-    filter_abs_path,
-)
 
-from toolboks.system import (  # noqa: F401
-    context,
-    getenv,
-)
+# Instrument the public functions when $TOOLBOKS_PERF is set, see toolboks.perf
+if _os.environ.get('TOOLBOKS_PERF', '').strip():
+    from toolboks import perf as _perf
+    _perf.enable()
@@ -0,0 +1,216 @@
+"""
+toolboks - Lightweight library & utility tools
+
+Copyright (C) 2022 Mikael Tranbom
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from toolboks.system import recommended_workers
+
+# Shared executors of toolboks.system.executor. Kept apart from toolboks.system
+# so concurrent.futures is only imported when a shared executor is used.
+
+
+class ExecutorStats(NamedTuple):
+    """Counters of a shared executor, see SharedExecutor.stats"""
+    name: str
+    kind: str
+    max_workers: int
+    submitted: int
+    completed: int
+    active: int
+    queued: int
+    utilisation: float
+
+
+class SharedExecutor(Executor):
+    """
+    Thread or process pool shared through `executor`. The pool is created
+    on the first submit, and counts the tasks submitted to it.
+
+    The executor is shared, so leaving a `with` block does not shut it down.
+    Calling `shutdown()` shuts the pool down, and the next submit starts a
+    new one. `shutdown_executors` also removes the executors from the
+    registry, an executor that is still used afterwards registers itself
+    again.
+    """
+    def __init__(self, kind: str, name: str, max_workers: int):
+        self.kind = kind
+        self.name = name
+        self.max_workers = max_workers
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+
+    def _get_pool(self) -> Executor:
+        """Return the pool, creating it on first use"""
+        with self._lock:
+            if self._pool is None:
+                with _executors_lock:
+                    _executors.setdefault((self.kind, self.name), self)
+
+                if self.kind == 'thread':
+                    self._pool = ThreadPoolExecutor(
+                        self.max_workers, thread_name_prefix=f'toolboks-{self.name}'
+                    )
+                else:
+                    self._pool = ProcessPoolExecutor(self.max_workers)
+
+            return self._pool
+
+    def _reset(self):
+        """Drop the pool and the counters, see _reset_executors"""
+        self._pool = None
+        self._lock = threading.Lock()
+        self._submitted = self._completed = 0
+
+    def _done(self, _: Future):
+        with self._lock:
+            self._completed += 1
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        """Schedule `fn(*args, **kwargs)` on the pool, see Executor.submit"""
+        future = self._get_pool().submit(fn, *args, **kwargs)
+
+        with self._lock:
+            self._submitted += 1
+
+        future.add_done_callback(self._done)
+        return future
+
+    def stats(self) -> ExecutorStats:
+        """
+        Return the counters of the pool. `active` is the number of tasks
+        being run, `queued` the number of tasks waiting for a worker and
+        `utilisation` the share of the workers that are busy.
+        """
+        with self._lock:
+            submitted, completed = self._submitted, self._completed
+
+        active = min(submitted - completed, self.max_workers)
+
+        return ExecutorStats(
+            self.name,
+            self.kind,
+            self.max_workers,
+            submitted,
+            completed,
+            active,
+            submitted - completed - active,
+            active / self.max_workers,
+        )
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """Shut the pool down, the next submit starts a new pool"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+
+        if pool is not None:
+            pool.shutdown(wait, cancel_futures=cancel_futures)
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return (
+            f"SharedExecutor(kind={self.kind!r}, name={self.name!r}, "
+            f"max_workers={self.max_workers})"
+        )
+
+
+# Shared executors by (kind, name)
+_executors: Dict[Tuple[str, str], SharedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def executor(
+    kind: str = 'thread',
+    name: str = 'default',
+    *,
+    max_workers: Optional[int] = None
+) -> SharedExecutor:
+    """
+    Return the shared executor `name` of `kind` 'thread' or 'process',
+    creating it on first use. All callers asking for the same kind and name
+    share one pool instead of each creating their own.
+
+    The pool is sized with `max_workers` when it is created, by default from
+    recommended_workers: 'io' for thread pools and 'cpu' for process pools.
+    Shared pools are shut down at exit, and a child process starts with no
+    pools after fork.
+
+    Example:
+    > pool = executor('thread', 'downloads')
+    > results = list(pool.map(download, urls))
+    > pool.stats().queued
+    0
+    """
+    if kind not in ('thread', 'process'):
+        raise ValueError(f"Invalid kind: {kind!r}")
+
+    with _executors_lock:
+        shared = _executors.get((kind, name))
+
+        if shared is None:
+            if max_workers is None:
+                max_workers = recommended_workers('io' if kind == 'thread' else 'cpu')
+
+            shared = _executors[(kind, name)] = SharedExecutor(kind, name, max_workers)
+
+    return shared
+
+
+def executor_stats() -> List[ExecutorStats]:
+    """Return the counters of all shared executors"""
+    with _executors_lock:
+        executors = list(_executors.values())
+
+    return [shared.stats() for shared in executors]
+
+
+def shutdown_executors(wait: bool = True):
+    """Shut down all shared executors and remove them from the registry"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+
+    for shared in executors:
+        shared.shutdown(wait)
+
+
+def _reset_executors():
+    """
+    Forget the pools of the parent process in a child after fork. Their
+    workers do not exist in the child, executors still held by callers
+    create new pools on their next submit.
+    """
+    global _executors_lock  # pylint: disable=global-statement
+
+    for shared in _executors.values():
+        shared._reset()  # pylint: disable=protected-access
+
+    _executors_lock = threading.Lock()
+    _executors.clear()
+
+
+atexit.register(shutdown_executors)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_executors)
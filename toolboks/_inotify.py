@@ -0,0 +1,121 @@
+"""
+toolboks - Lightweight library & utility tools
+
+Copyright (C) 2022 Mikael Tranbom
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import ctypes
+import os
+import struct
+import sys
+from typing import List, Optional, Tuple
+
+# Linux inotify(7) interface through ctypes, used by config.watch
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct('iIII')
+
+_libc: Optional[ctypes.CDLL] = None
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    """Return the C library if it provides inotify, otherwise None"""
+    global _libc  # pylint: disable=global-statement
+
+    if _libc is None and sys.platform.startswith('linux'):
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            libc.inotify_init1  # pylint: disable=pointless-statement
+        except (OSError, AttributeError):
+            return None
+
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+        ]
+        _libc = libc
+
+    return _libc
+
+
+def available() -> bool:
+    """Return True if inotify can be used on this system"""
+    return _load_libc() is not None
+
+
+class Inotify:
+    """Non-blocking inotify instance"""
+    def __init__(self):
+        libc = _load_libc()
+
+        if libc is None:
+            raise OSError("inotify is not available")
+
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """Watch `path` for the events in `mask` and return the watch descriptor"""
+        descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+
+        return descriptor
+
+    def read(self) -> List[Tuple[int, int, str]]:
+        """Return all pending events as (watch descriptor, mask, name)"""
+        events = []
+
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return events
+
+            position = 0
+
+            while position < len(data):
+                descriptor, mask, _, length = _EVENT.unpack_from(data, position)
+                position += _EVENT.size
+                name = data[position:position + length].rstrip(b'\0')
+                position += length
+                events.append((descriptor, mask, os.fsdecode(name)))
+
+    def fileno(self) -> int:
+        """Return the file descriptor, readable when events are pending"""
+        return self._fd
+
+    def close(self):
+        """Close the inotify instance"""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
@@ -0,0 +1,394 @@
+"""
+toolboks - Lightweight library & utility tools
+
+Copyright (C) 2022 Mikael Tranbom
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, Union
+
+from toolboks.config import Schema, Signature, _build, _count, _stat
+
+# Watching of configuration files for toolboks.config.watch and awatch. Kept
+# apart from toolboks.config so reading a file does not load the watcher.
+# asyncio, configparser, hashlib, select and toolboks._inotify are imported
+# where they are used.
+# pylint: disable=import-outside-toplevel
+
+
+# Changes between two versions of a file: section -> key -> (old, new).
+# A value that was added has None as old value, a removed value None as new.
+ConfigDiff = Dict[str, Dict[str, Tuple[Optional[Any], Optional[Any]]]]
+
+
+def diff(
+    old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]
+) -> ConfigDiff:
+    """
+    Return the values that differ between two parsed configurations
+    (e.g. two results of read_config with as_dict=True) as
+    section -> key -> (old value, new value). Missing values are None.
+    """
+    changes: ConfigDiff = {}
+
+    for section in {**old, **new}:
+        old_options = old.get(section, {})
+        new_options = new.get(section, {})
+
+        for key in {**old_options, **new_options}:
+            old_value = old_options.get(key)
+            new_value = new_options.get(key)
+
+            if old_value != new_value:
+                changes.setdefault(section, {})[key] = (old_value, new_value)
+
+    return changes
+
+
+class _WatchedFile:
+    """
+    Current content of a watched file. The file is only parsed again when the
+    hash of its content changed, not on every event or new modification time.
+    """
+    def __init__(self, path: str, schema: Optional[Union[Schema, Dict]]):
+        self.path = path
+        self.schema = schema if schema is None or isinstance(schema, Schema) \
+            else Schema(schema)
+        self.signature: Optional[Signature] = None
+        self.digest: Optional[bytes] = None
+        self.data: Dict[str, Dict[str, Any]] = {}
+        self.check()
+
+    def stat(self) -> Optional[Signature]:
+        """Return the current stat signature of the file, None if missing"""
+        try:
+            return _stat(self.path)[1]
+        except FileNotFoundError:
+            return None
+
+    def check(self) -> Optional[Tuple[SimpleNamespace, ConfigDiff]]:
+        """
+        Read the file and return the new configuration and the differences
+        to the previous version, or None if the content did not change.
+        A file that does not exist (e.g. in the middle of a save) is ignored.
+        """
+        try:
+            self.signature = _stat(self.path)[1]
+
+            with open(self.path, 'rb') as config_file:
+                content = config_file.read()
+        except FileNotFoundError:
+            self.signature = None
+            return None
+
+        import hashlib
+
+        _count('bytes_read', len(content))
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+
+        if digest == self.digest:
+            return None
+
+        import configparser
+
+        parser = configparser.ConfigParser()
+        parser.read_string(content.decode('utf-8'), source=self.path)
+        data: Dict[str, Dict[str, Any]] = {
+            section: dict(parser[section])
+            for section in parser.sections()
+        }
+
+        if self.schema is not None:
+            data = self.schema.apply(data)
+
+        changes = diff(self.data, data)
+        self.digest = digest
+        self.data = data
+
+        return _build(data, False), changes
+
+
+class _DirectoryEvents:
+    """
+    inotify watch on the directory of a file, so saves that write a temporary
+    file and rename it over the original are seen as well.
+    """
+    def __init__(self, path: str):
+        from toolboks import _inotify
+
+        # events on the directory that can change the watched file
+        events = (
+            _inotify.IN_CLOSE_WRITE | _inotify.IN_MODIFY | _inotify.IN_ATTRIB
+            | _inotify.IN_MOVED_TO | _inotify.IN_MOVED_FROM
+            | _inotify.IN_CREATE | _inotify.IN_DELETE
+        )
+        self.name = os.path.basename(path)
+        self.inotify = _inotify.Inotify()
+
+        try:
+            self.inotify.add_watch(os.path.dirname(path), events)
+        except OSError:
+            self.inotify.close()
+            raise
+
+    def pending(self) -> bool:
+        """Read all queued events. Return True if any concern the file"""
+        return any(name == self.name for _, _, name in self.inotify.read())
+
+    def fileno(self) -> int:
+        """Return the inotify file descriptor"""
+        return self.inotify.fileno()
+
+    def close(self):
+        """Stop watching"""
+        self.inotify.close()
+
+
+def _directory_events(
+    path: str, use_inotify: Optional[bool]
+) -> Optional[_DirectoryEvents]:
+    """
+    Return an inotify watch for `path`, or None when polling should be used.
+    `use_inotify` None means inotify when available.
+    """
+    from toolboks import _inotify
+
+    if use_inotify is False or (use_inotify is None and not _inotify.available()):
+        return None
+
+    return _DirectoryEvents(path)
+
+
+class Watcher:
+    """
+    Background thread that calls `callback(config, changes)` when the
+    content of a configuration file changes. See `watch`.
+    """
+    def __init__(
+        self,
+        file: str,
+        callback: Callable[[SimpleNamespace, ConfigDiff], Any],
+        *,
+        interval: float = 1.0,
+        debounce: float = 0.1,
+        use_inotify: Optional[bool] = None,
+        schema: Optional[Union[Schema, Dict]] = None,
+    ):
+        path = os.path.abspath(file)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            raise FileNotFoundError("Invalid directory")
+
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self._file = _WatchedFile(path, schema)
+        self._events = _directory_events(path, use_inotify)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f'toolboks-watch-{path}', daemon=True
+        )
+
+    @property
+    def data(self) -> Dict[str, Dict[str, Any]]:
+        """Last version of the configuration seen by the watcher"""
+        return self._file.data
+
+    @property
+    def uses_inotify(self) -> bool:
+        """True if the watcher is notified by inotify instead of polling"""
+        return self._events is not None
+
+    def start(self) -> 'Watcher':
+        """Start watching in a background thread"""
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop watching and wait for the background thread to finish"""
+        self._stop.set()
+
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+        if self._events is not None:
+            self._events.close()
+
+    def __enter__(self) -> 'Watcher':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _wait(self) -> bool:
+        """
+        Wait for the file to change and for the burst of writes to settle.
+        Return False if the watcher was stopped.
+        """
+        import select
+
+        while not self._stop.is_set():
+            if self._events is not None:
+                readable, _, _ = select.select([self._events], [], [], self.interval)
+                changed = bool(readable) and self._events.pending()
+            else:
+                self._stop.wait(self.interval)
+                signature = self._file.stat()
+                changed = signature != self._file.signature
+
+            if changed:
+                break
+
+        # Debounce: wait until the file has been quiet for `debounce` seconds
+        while not self._stop.is_set():
+            if self._events is not None:
+                readable, _, _ = select.select([self._events], [], [], self.debounce)
+                if not readable or not self._events.pending():
+                    break
+            else:
+                self._stop.wait(self.debounce)
+                previous, signature = signature, self._file.stat()
+                if signature == previous:
+                    break
+
+        return not self._stop.is_set()
+
+    def _run(self):
+        while self._wait():
+            # A file that fails to parse or a failing callback is reported,
+            # the watcher keeps running
+            try:
+                change = self._file.check()
+
+                if change is not None:
+                    self.callback(*change)
+            except Exception:  # pylint: disable=broad-except
+                sys.excepthook(*sys.exc_info())
+
+
+def watch(
+    file: str,
+    callback: Callable[[SimpleNamespace, ConfigDiff], Any],
+    *,
+    interval: float = 1.0,
+    debounce: float = 0.1,
+    use_inotify: Optional[bool] = None,
+    schema: Optional[Union[Schema, Dict]] = None,
+) -> Watcher:
+    """
+    Watch a configuration file and call `callback(config, changes)` from a
+    background thread every time its content changes. `config` is the new
+    configuration as returned by read_config and `changes` holds the values
+    that changed as section -> key -> (old value, new value).
+
+    On Linux the directory of the file is watched with inotify, so saves that
+    replace the file through a rename are seen as well. Elsewhere, or with
+    `use_inotify` set to False, the file is checked with stat every
+    `interval` seconds. Bursts of writes are merged until the file has been
+    quiet for `debounce` seconds, and the file is only parsed again when its
+    content changed. Exceptions from `callback` are reported through
+    sys.excepthook and do not stop the watcher.
+
+    Return the running Watcher. Call its `stop()` method, or use it as a
+    context manager, to stop watching.
+
+    Example:
+    > def reload(config, changes):
+    >     print(changes)
+    > with watch('app.ini', reload):
+    >     serve()
+    """
+    return Watcher(
+        file,
+        callback,
+        interval=interval,
+        debounce=debounce,
+        use_inotify=use_inotify,
+        schema=schema,
+    ).start()
+
+
+async def awatch(
+    file: str,
+    *,
+    interval: float = 1.0,
+    debounce: float = 0.1,
+    use_inotify: Optional[bool] = None,
+    schema: Optional[Union[Schema, Dict]] = None,
+) -> AsyncIterator[Tuple[SimpleNamespace, ConfigDiff]]:
+    """
+    Asynchronous variant of `watch` for asyncio. Yield (config, changes) each
+    time the content of `file` changes. The inotify file descriptor is
+    registered with the running event loop, so no thread is used.
+
+    Example:
+    > async for config, changes in awatch('app.ini'):
+    >     apply(config)
+    """
+    path = os.path.abspath(file)
+
+    if not os.path.isdir(os.path.dirname(path)):
+        raise FileNotFoundError("Invalid directory")
+
+    import asyncio
+
+    watched = _WatchedFile(path, schema)
+    events = _directory_events(path, use_inotify)
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+
+    if events is not None:
+        loop.add_reader(events.fileno(), ready.set)
+
+    async def wait_for_event(timeout: Optional[float]) -> bool:
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+        ready.clear()
+        return events.pending()
+
+    try:
+        while True:
+            if events is not None:
+                if not await wait_for_event(None):
+                    continue
+
+                while await wait_for_event(debounce):
+                    pass
+            else:
+                await asyncio.sleep(interval)
+                signature = watched.stat()
+
+                if signature == watched.signature:
+                    continue
+
+                while True:
+                    await asyncio.sleep(debounce)
+                    previous, signature = signature, watched.stat()
+                    if signature == previous:
+                        break
+
+            change = watched.check()
+
+            if change is not None:
+                yield change
+    finally:
+        if events is not None:
+            loop.remove_reader(events.fileno())
+            events.close()
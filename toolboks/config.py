@@ -15,64 +15,1295 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-import configparser
-from pathlib import Path
-from types import SimpleNamespace
-from typing import Dict, Literal, Union, overload
+import os
+import re
+import stat
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import timedelta
+from types import MappingProxyType, SimpleNamespace
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+    overload,
+)
+
+from toolboks import xdg
+from toolboks.modifiers import parse_bool, parse_duration, parse_list
+
+if TYPE_CHECKING:  # pragma: no coverage
+    from concurrent.futures import Executor
+
+# asyncio, concurrent.futures, configparser, hashlib, marshal, mmap and
+# tempfile are imported where they are used, to keep
+# `import toolboks.config` fast for short-lived tools
+# pylint: disable=import-outside-toplevel
+
+# Parsed configuration: section name -> option name -> raw value
+ConfigData = Dict[str, Dict[str, str]]
+
+# Identity of one version of a file: (st_mtime_ns, st_size, st_ino)
+Signature = Tuple[int, int, int]
+
+# Default of a Field without default value
+REQUIRED = object()
+
+# Converters used by Schema for types that can not convert a str by calling
+_CONVERTERS: Dict[Any, Callable[[str], Any]] = {
+    bool: parse_bool,
+    list: parse_list,
+    timedelta: parse_duration,
+}
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of the read_config cache"""
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class CacheEntry:  # pylint: disable=too-few-public-methods
+    """
+    One cached version of a file: its signature, the parsed data and any
+    derived forms of the data keyed by what they were derived with.
+    Forms derived with a Schema are kept per Schema object and dropped
+    together with the Schema, so a short-lived Schema never grows the cache.
+    """
+    __slots__ = ('signature', 'data', 'variants', 'schemas')
+
+    def __init__(self, signature: Signature, data: ConfigData):
+        self.signature = signature
+        self.data = data
+        self.variants: Dict[Hashable, Any] = {}
+        self.schemas: 'weakref.WeakKeyDictionary[Schema, Dict[Hashable, Any]]' = \
+            weakref.WeakKeyDictionary()
+
+    def schema_variants(self, schema: 'Schema') -> Dict[Hashable, Any]:
+        """Return the forms of the data derived with `schema`"""
+        variants = self.schemas.get(schema)
+
+        if variants is None:
+            variants = self.schemas.setdefault(schema, {})
+
+        return variants
+
+
+class ConfigCache:
+    """
+    Bounded LRU cache of parsed configuration files.
+
+    Entries are keyed on the absolute path of a file and validated against
+    the (st_mtime_ns, st_size, st_ino) signature from a fresh stat on every
+    lookup, so a file that is modified or replaced is parsed again.
+    The cached data is never handed out directly, callers always get new
+    objects built from it.
+    """
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, signature: Signature) -> Optional[CacheEntry]:
+        """Return the cached entry for `path` if it matches `signature`"""
+        with self._lock:
+            entry = self._entries.get(path)
+
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            return None
+
+    def put(self, path: str, signature: Signature, data: ConfigData) -> CacheEntry:
+        """
+        Store `data` for `path`, evicting the least recently used entries.
+        Return the new entry.
+        """
+        entry = CacheEntry(signature, data)
+
+        if self.maxsize <= 0:
+            return entry
+
+        with self._lock:
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def invalidate(self, path: str) -> bool:
+        """Remove `path` from the cache. Return True if it was cached"""
+        with self._lock:
+            return self._entries.pop(path, None) is not None
+
+    def clear(self):
+        """Remove all entries and reset the statistics"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> CacheInfo:
+        """Return the cache statistics"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+class ConfigError(ValueError):
+    """Raised when a configuration value does not match its schema"""
+
+
+class Field:  # pylint: disable=too-few-public-methods
+    """
+    Schema for one configuration value.
+
+    `type` converts the raw string: str, int, float, bool, list, timedelta or
+    any callable that takes a str. `default` is used when the key is missing,
+    a Field without default is required. `validator` is called with the
+    converted value and must return True for valid values.
+    """
+    __slots__ = ('type', 'default', 'validator')
+
+    def __init__(
+        self,
+        type: Callable[[str], Any] = str,  # pylint: disable=redefined-builtin
+        default: Any = REQUIRED,
+        validator: Optional[Callable[[Any], bool]] = None,
+    ):
+        self.type = type
+        self.default = default
+        self.validator = validator
+
+
+class Schema:
+    """
+    Compiled schema for typed configuration loading.
+
+    `sections` maps section names to dicts of key -> Field. A plain type or
+    callable can be used instead of a Field for a required value.
+    The schema is compiled once into a table of converters that is applied
+    in a single pass over each parsed file. Keys and sections that are not in
+    the schema are kept as strings.
+
+    Example:
+    > schema = Schema({
+    >     'server': {
+    >         'port': Field(int, default=8080, validator=lambda port: port > 0),
+    >         'debug': Field(bool, default=False),
+    >         'timeout': timedelta,
+    >         'hosts': list,
+    >     }
+    > })
+    > config = read_config('app.ini', schema=schema)
+    > config.server.port
+    8080
+    """
+    def __init__(self, sections: Dict[str, Dict[str, Any]]):
+        self.sections: Dict[str, Tuple[Tuple[str, Callable, Any, Any], ...]] = {}
+
+        for section, keys in sections.items():
+            table = []
+
+            for key, field in keys.items():
+                if not isinstance(field, Field):
+                    field = Field(field)
+
+                converter = _CONVERTERS.get(field.type, field.type)
+                table.append((key.lower(), converter, field.default, field.validator))
+
+            self.sections[section] = tuple(table)
+
+    def apply(self, data: ConfigData) -> Dict[str, Dict[str, Any]]:
+        """
+        Return a copy of `data` with the values in the schema converted.
+        Raise ConfigError for missing, invalid or rejected values.
+        """
+        typed = {
+            section: self.apply_section(section, options)
+            for section, options in data.items()
+        }
+
+        for section in self.sections:
+            if section not in typed:
+                typed[section] = self.apply_section(section, {})
+
+        return typed
+
+    def apply_section(self, section: str, options: Dict[str, str]) -> Dict[str, Any]:
+        """Return a copy of the options of one section with values converted"""
+        options = dict(options)
+
+        for key, converter, default, validator in self.sections.get(section, ()):
+            if key not in options:
+                if default is REQUIRED:
+                    raise ConfigError(f"{section}.{key}: missing required value")
+                options[key] = default
+                continue
+
+            try:
+                value = converter(options[key])
+            except (TypeError, ValueError) as error:
+                raise ConfigError(f"{section}.{key}: {error}") from None
+
+            if validator is not None and not validator(value):
+                raise ConfigError(f"{section}.{key}: invalid value {value!r}")
+
+            options[key] = value
+
+        return options
+
+
+class LayeredConfig(NamedTuple):
+    """
+    Result of read_layered: the merged configuration, the file each value
+    came from as sources[section][key], and the files that were merged in
+    order of increasing precedence.
+    """
+    config: Union[Dict, SimpleNamespace]
+    sources: Dict[str, Dict[str, str]]
+    files: Tuple[str, ...]
+
+
+_cache = ConfigCache()
+
+# Format version of the snapshots written by read_config with snapshot=True
+SNAPSHOT_VERSION = 1
+
+# Section indexes of files read with lazy=True
+_index_cache = ConfigCache()
+
+# Name of the section with default values, configparser.DEFAULTSECT
+_DEFAULT_SECTION = 'DEFAULT'
+
+# Section header as matched by configparser: the stripped line starts with
+# '[' and the name runs to its last ']', any text after it is ignored. An
+# indented header may continue the value of the previous option instead,
+# see _scan_sections.
+_SECTION_HEADER = re.compile(rb'^([ \t\f\v]*)\[(.+)\]', re.MULTILINE)
+
+# I/O counters reported by toolboks.perf
+_counters = {'bytes_read': 0, 'snapshot_hits': 0, 'snapshot_misses': 0}
+_counters_lock = threading.Lock()
+
+# Merged views of read_layered: (app_name, filename, candidates) ->
+# (merged entry, sources, files)
+_layered: Dict[Tuple, Tuple[CacheEntry, Dict, Tuple[str, ...]]] = {}
+_layered_lock = threading.Lock()
+
+
+def _stat(file: str) -> Tuple[str, Signature]:
+    """
+    Return the absolute path and the signature of `file`.
+    Raise FileNotFoundError if `file` is not an existing regular file.
+    """
+    path = os.path.abspath(file)
+
+    try:
+        file_stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise FileNotFoundError("Invalid filename") from None
+
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise FileNotFoundError("Invalid filename")
+
+    return path, (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+
+
+def _count(name: str, value: int = 1):
+    """Add `value` to the I/O counter `name`"""
+    with _counters_lock:
+        _counters[name] += value
+
+
+def _parse(path: str) -> ConfigData:
+    """Parse the configuration file at `path`"""
+    import configparser
+
+    config_file = configparser.ConfigParser()
+    config_file.read(path)
+
+    return {
+        section: dict(config_file[section])
+        for section in config_file.sections()
+    }
+
+
+def _snapshot_path(path: str) -> str:
+    """Return the snapshot file of the configuration file at `path`"""
+    import hashlib
+
+    name = hashlib.blake2b(os.fsencode(path), digest_size=16).hexdigest()
+
+    return os.path.join(xdg.cache_home(), 'toolboks', 'config', f'{name}.snapshot')
+
+
+def _read_snapshot(path: str, signature: Signature) -> Optional[ConfigData]:
+    """
+    Return the data stored in the snapshot of `path`, or None if there is no
+    snapshot or it was written for another version of the file
+    """
+    import marshal
+
+    try:
+        with open(_snapshot_path(path), 'rb') as snapshot_file:
+            version, snapshot_path, snapshot_signature, data = marshal.load(
+                snapshot_file
+            )
+            _count('bytes_read', snapshot_file.tell())
+    except (OSError, EOFError, ValueError, TypeError):
+        _count('snapshot_misses')
+        return None
+
+    if (version, snapshot_path, snapshot_signature) != \
+            (SNAPSHOT_VERSION, path, signature):
+        _count('snapshot_misses')
+        return None
+
+    _count('snapshot_hits')
+    return data
+
+
+def _write_snapshot(path: str, signature: Signature, data: ConfigData):
+    """
+    Store the parsed data of `path` as a snapshot. The snapshot is written to
+    a temporary file that replaces the previous snapshot in one rename, so
+    readers and concurrent writers always see a complete file. Errors are
+    ignored, the snapshot is only an optimization.
+    """
+    import marshal
+    import tempfile
+
+    snapshot = _snapshot_path(path)
+    directory = os.path.dirname(snapshot)
+
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(descriptor, 'wb') as snapshot_file:
+            marshal.dump((SNAPSHOT_VERSION, path, signature, data), snapshot_file)
+        os.replace(temporary, snapshot)
+    except OSError:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+
+
+def _load(file: str, cache: bool, snapshot: bool = False) -> CacheEntry:
+    """Return the parsed data of `file`, from the cache when it is unchanged"""
+    path, signature = _stat(file)
+
+    return _load_stat(path, signature, cache, snapshot)
+
+
+def _load_stat(
+    path: str, signature: Signature, cache: bool, snapshot: bool = False
+) -> CacheEntry:
+    """Return the parsed data of the file at `path` with the given signature"""
+    if not cache:
+        _count('bytes_read', signature[1])
+        return CacheEntry(signature, _parse(path))
+
+    entry = _cache.get(path, signature)
+
+    if entry is not None:
+        return entry
+
+    data = _read_snapshot(path, signature) if snapshot else None
+
+    if data is None:
+        _count('bytes_read', signature[1])
+        data = _parse(path)
+
+        if snapshot:
+            _write_snapshot(path, signature, data)
+
+    return _cache.put(path, signature, data)
+
+
+def _env_overrides(prefix: str) -> Tuple[Tuple[str, str, str], ...]:
+    """
+    Return the overrides for `prefix` in the environment as
+    (section, key, value), scanning os.environ once
+    """
+    start = f'{prefix}__'
+    overrides = []
+
+    for name, value in os.environ.items():
+        if not name.startswith(start):
+            continue
+
+        section, separator, key = name[len(start):].partition('__')
+
+        if separator and section and key:
+            overrides.append((section, key.lower(), value))
+
+    return tuple(sorted(overrides))
+
+
+def _with_env(entry: CacheEntry, prefix: str) -> CacheEntry:
+    """
+    Return an entry with the data of `entry` overridden by the environment.
+    The result is kept with `entry`, keyed by the overrides, so typed and
+    frozen variants of it are cached as well.
+    """
+    overrides = _env_overrides(prefix)
+
+    if not overrides:
+        return entry
+
+    key = ('env', overrides)
+    overridden = entry.variants.get(key)
+
+    if overridden is None:
+        sections = {section.lower(): section for section in entry.data}
+        data = {section: dict(options) for section, options in entry.data.items()}
+
+        for section, option, value in overrides:
+            section = sections.setdefault(section.lower(), section.lower())
+            data.setdefault(section, {})[option] = value
+
+        overridden = entry.variants[key] = CacheEntry(entry.signature, data)
+
+    return overridden
+
+
+def _typed(
+    entry: CacheEntry,
+    schema: Union[Schema, Dict]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Return the data of `entry` typed by `schema`. The result is kept with the
+    cache entry, so each version of a file is converted only once per Schema.
+    """
+    if not isinstance(schema, Schema):
+        return Schema(schema).apply(entry.data)
+
+    variants = entry.schema_variants(schema)
+    typed = variants.get('typed')
+
+    if typed is None:
+        typed = variants['typed'] = schema.apply(entry.data)
+
+    return typed
+
+
+def _copy(value: Any) -> Any:
+    """Return a copy of mutable list values, so cached values can't be changed"""
+    return value.copy() if isinstance(value, list) else value
+
+
+def _build(
+    data: Dict[str, Dict[str, Any]],
+    as_dict: bool
+) -> Union[Dict, SimpleNamespace]:
+    """Build a new dict or SimpleNamespace from parsed data"""
+    if as_dict:
+        return {
+            section: {key: _copy(value) for key, value in options.items()}
+            for section, options in data.items()
+        }
+
+    return SimpleNamespace(**{
+        section: SimpleNamespace(**{
+            key: _copy(value) for key, value in options.items()
+        })
+        for section, options in data.items()
+    })
+
+
+def _scan_sections(data: bytes) -> List[Tuple[str, int]]:
+    """
+    Return the name and offset of every section header in `data`, following
+    configparser line by line. An indented line continues the value of the
+    previous option when it is indented deeper than that option, and is only
+    a header otherwise. Comments and empty lines are skipped.
+    """
+    headers = []
+    offset = 0
+    indent = 0
+    in_value = False
+
+    for line in data.splitlines(keepends=True):
+        start = offset
+        offset += len(line)
+        value = line.strip()
+
+        if not value or value.startswith((b'#', b';')):
+            continue
+
+        line_indent = len(line) - len(line.lstrip())
+
+        if in_value and line_indent > indent:
+            continue
+
+        indent = line_indent
+        match = _SECTION_HEADER.match(line)
+        in_value = match is None
+
+        if match:
+            headers.append((match.group(2).decode('utf-8'), start))
+
+    return headers
+
+
+def _index_sections(path: str, size: int) -> Dict[str, Tuple[int, int]]:
+    """
+    Scan the file at `path` once through mmap and return the byte range of
+    every section, including its header, by section name.
+    """
+    import mmap
+
+    spans: Dict[str, Tuple[int, int]] = {}
+
+    if not size:
+        return spans
+
+    with open(path, 'rb') as config_file:
+        with mmap.mmap(config_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            matches = list(_SECTION_HEADER.finditer(data))
+
+            if any(match.group(1) for match in matches):
+                headers = _scan_sections(data[:])
+            else:
+                headers = [
+                    (match.group(2).decode('utf-8'), match.start())
+                    for match in matches
+                ]
+
+    for number, (name, start) in enumerate(headers):
+        if name in spans:
+            import configparser
+
+            raise configparser.DuplicateSectionError(name, path)
+
+        end = headers[number + 1][1] if number + 1 < len(headers) else size
+        spans[name] = (start, end)
+
+    return spans
+
+
+def _lazy_entry(path: str) -> CacheEntry:
+    """
+    Return the section index of `path` from the index cache, or index the
+    file again if it changed. Parsed sections are kept in the entry variants.
+    """
+    path, signature = _stat(path)
+    entry = _index_cache.get(path, signature)
+
+    if entry is None:
+        _count('bytes_read', signature[1])
+        entry = _index_cache.put(path, signature, _index_sections(path, signature[1]))
+
+    return entry
+
+
+def _parse_section(path: str, spans: Dict[str, Tuple[int, int]], section: str) -> Dict:
+    """Read and parse one section, together with the DEFAULT section"""
+    chunks = []
+
+    with open(path, 'rb') as config_file:
+        for name in (_DEFAULT_SECTION, section):
+            if name in spans:
+                start, end = spans[name]
+                config_file.seek(start)
+                # an indented header must not continue the DEFAULT values
+                chunks.append(config_file.read(end - start).lstrip())
+
+    import configparser
+
+    _count('bytes_read', sum(map(len, chunks)))
+    config_file = configparser.ConfigParser()
+    config_file.read_string(b'\n'.join(chunks).decode('utf-8'), source=path)
+
+    return dict(config_file[section])
+
+
+class LazyConfig(Mapping):
+    """
+    Configuration file that is parsed one section at a time.
+
+    The file is indexed once when it is read, and a section is parsed the
+    first time it is accessed. Attribute access returns a SimpleNamespace
+    like read_config, item access returns a dict:
+
+    > config = read_config('tenants.ini', lazy=True)
+    > config.tenant_42.quota
+    '100'
+    > config['tenant_42']['quota']
+    '100'
+
+    The section index and the parsed sections are cached per version of the
+    file and shared between LazyConfig objects.
+    """
+    def __init__(self, file: str, schema: Optional[Union[Schema, Dict]] = None):
+        # sections typed by a dict schema are not cached, like read_config
+        self._shared = schema is None or isinstance(schema, Schema)
+
+        if not self._shared:
+            schema = Schema(schema)
+
+        self._path = os.path.abspath(file)
+        self._schema = schema
+        self._sections: Dict[str, Dict[str, Any]] = {}
+        self._names = [
+            name for name in _lazy_entry(self._path).data
+            if name != _DEFAULT_SECTION
+        ]
+
+        if schema is not None:
+            self._names.extend(
+                name for name in schema.sections if name not in self._names
+            )
+
+    def _section(self, section: str) -> Dict[str, Any]:
+        """Return the parsed options of `section`, parsing it on first access"""
+        options = self._sections.get(section)
+
+        if options is not None:
+            return options
+
+        if section not in self._names:
+            raise KeyError(section)
+
+        entry = _lazy_entry(self._path)
+        typed = None
+
+        if self._schema is not None and self._shared:
+            typed = entry.schema_variants(self._schema)
+            options = typed.get(section)
+
+        if options is None:
+            options = entry.variants.get(section)
+
+            if options is None:
+                options = {}
+
+                if section in entry.data:
+                    options = _parse_section(self._path, entry.data, section)
+
+                entry.variants[section] = options
+
+            if self._schema is not None:
+                options = self._schema.apply_section(section, options)
+
+                if typed is not None:
+                    typed[section] = options
+
+        self._sections[section] = options
+        return options
+
+    def sections(self) -> List[str]:
+        """Return the names of all sections without parsing them"""
+        return list(self._names)
+
+    def __getitem__(self, section: str) -> Dict[str, Any]:
+        return {key: _copy(value) for key, value in self._section(section).items()}
+
+    def __getattr__(self, section: str) -> SimpleNamespace:
+        if section.startswith('_'):
+            raise AttributeError(section)
+
+        try:
+            return SimpleNamespace(**self[section])
+        except KeyError:
+            raise AttributeError(section) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __repr__(self) -> str:
+        return f"LazyConfig({self._path!r}, sections={len(self._names)})"
+
+
+class _Layout(dict):
+    """
+    Key -> position table shared by all frozen mappings with the same keys.
+    A dict subclass so it can be referenced weakly.
+    """
+    __slots__ = ('__weakref__',)
+
+
+# Layouts in use, keyed by their keys in order
+_layouts: 'weakref.WeakValueDictionary[Tuple[str, ...], _Layout]' = \
+    weakref.WeakValueDictionary()
+_layouts_lock = threading.Lock()
+
+
+def _layout(keys: Tuple[str, ...]) -> _Layout:
+    """Return the shared layout of `keys`, with the keys interned"""
+    with _layouts_lock:
+        layout = _layouts.get(keys)
+
+        if layout is None:
+            layout = _layouts[keys] = _Layout(
+                (sys.intern(key), position) for position, key in enumerate(keys)
+            )
+
+    return layout
+
+
+class _FrozenMapping(Mapping):
+    """
+    Read-only mapping with attribute access. The keys are kept in a layout
+    shared by all instances with the same keys, and the values in a tuple.
+    """
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, items: Dict[str, Any]):
+        object.__setattr__(self, '_layout', _layout(tuple(items)))
+        object.__setattr__(self, '_values', tuple(items.values()))
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._layout[key]]
+
+    def __getattr__(self, key: str) -> Any:
+        try:
+            return self._values[self._layout[key]]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, key: str):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._layout
+
+    def __dir__(self) -> List[str]:
+        return [*super().__dir__(), *self._layout]
+
+    def __reduce__(self):
+        return type(self), (dict(self.items()),)
+
+    def __repr__(self) -> str:
+        items = ', '.join(f'{key}={value!r}' for key, value in self.items())
+        return f"{type(self).__name__}({items})"
+
+
+class Section(_FrozenMapping):
+    """
+    Read-only section of a frozen configuration, see Config.
+    List values are stored as tuples.
+    """
+    __slots__ = ()
+
+
+class Config(_FrozenMapping):
+    """
+    Read-only configuration returned by read_config with frozen=True.
+    Sections and values can be accessed both as attributes and as items:
+
+    > config = read_config('app.ini', frozen=True)
+    > config.server.port
+    '8080'
+    > config['server']['port']
+    '8080'
+
+    Sections with the same options share one key layout, which makes a
+    Config far smaller than the SimpleNamespace or dict of read_config.
+    Names that are also Mapping methods (e.g. `keys`) are only available as
+    items.
+    """
+    __slots__ = ()
+
+
+def _freeze(data: Dict[str, Dict[str, Any]]) -> Config:
+    """Build a Config from parsed data"""
+    return Config({
+        section: Section({
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in options.items()
+        })
+        for section, options in data.items()
+    })
+
+
+def _frozen(entry: CacheEntry, schema: Optional[Union[Schema, Dict]]) -> Config:
+    """
+    Return the frozen Config of `entry`. Config objects are read-only, so one
+    is kept with the cache entry and shared by all callers.
+    """
+    if schema is not None and not isinstance(schema, Schema):
+        return _freeze(Schema(schema).apply(entry.data))
+
+    variants = entry.variants if schema is None else entry.schema_variants(schema)
+    config = variants.get('frozen')
+
+    if config is None:
+        data = entry.data if schema is None else _typed(entry, schema)
+        config = variants['frozen'] = _freeze(data)
+
+    return config
+
+
+def cache_info() -> CacheInfo:
+    """
+    Return hits, misses, maximum size and current size of the read_config cache
+    """
+    return _cache.info()
+
+
+def cache_clear():
+    """Remove all files from the read_config cache and reset its statistics"""
+    _cache.clear()
+    _index_cache.clear()
+
+    with _layered_lock:
+        _layered.clear()
+
+
+def invalidate(file: str) -> bool:
+    """
+    Remove `file` from the read_config cache, so it is parsed again on the
+    next call. Return True if the file was cached.
+    """
+    path = os.path.abspath(file)
+    indexed = _index_cache.invalidate(path)
+
+    return _cache.invalidate(path) or indexed
 
 
 @overload
 def read_config(
     file: str,
-    as_dict: Literal[False] = False
+    as_dict: Literal[False] = False,
+    *,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    lazy: Literal[False] = False,
+    snapshot: bool = False,
+    frozen: Literal[False] = False,
+    env_prefix: Optional[str] = None
 ) -> SimpleNamespace:  # pragma: no coverage
     ...
 
 
 @overload
-def read_config(file: str, as_dict: Literal[True]) -> Dict:  # pragma: no coverage
+def read_config(
+    file: str,
+    as_dict: Literal[True],
+    *,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    lazy: Literal[False] = False,
+    snapshot: bool = False,
+    frozen: Literal[False] = False,
+    env_prefix: Optional[str] = None
+) -> Dict:  # pragma: no coverage
     ...
 
 
 @overload
 def read_config(
     file: str,
-    as_dict: bool
+    as_dict: bool,
+    *,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    lazy: Literal[False] = False,
+    snapshot: bool = False,
+    frozen: Literal[False] = False,
+    env_prefix: Optional[str] = None
 ) -> Union[Dict,  SimpleNamespace]:  # pragma: no coverage
     ...
 
 
-def read_config(file: str, as_dict: bool = False):
+@overload
+def read_config(
+    file: str,
+    as_dict: Literal[False] = False,
+    *,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    lazy: Literal[True],
+    snapshot: Literal[False] = False,
+    frozen: Literal[False] = False,
+    env_prefix: Optional[str] = None
+) -> LazyConfig:  # pragma: no coverage
+    ...
+
+
+@overload
+def read_config(
+    file: str,
+    as_dict: Literal[False] = False,
+    *,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    lazy: Literal[False] = False,
+    snapshot: bool = False,
+    frozen: Literal[True],
+    env_prefix: Optional[str] = None
+) -> Config:  # pragma: no coverage
+    ...
+
+
+@overload
+def read_config(
+    file: str,
+    as_dict: Literal[True],
+    *,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    lazy: Literal[False] = False,
+    snapshot: bool = False,
+    frozen: Literal[True],
+    env_prefix: Optional[str] = None
+) -> MappingProxyType:  # pragma: no coverage
+    ...
+
+
+def read_config(
+    file: str,
+    as_dict: bool = False,
+    *,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    lazy: bool = False,
+    snapshot: bool = False,
+    frozen: bool = False,
+    env_prefix: Optional[str] = None
+):
     """
     Read a configuration file and return as either a SimpleNamespace
     object or as a dict if `as_dict` is True
+
+    Parsed files are cached (see `cache_info`) and only parsed again when
+    their modification time, size or inode changes. Every call returns new
+    objects, so changes made by one caller are never seen by another.
+    Set `cache` to False to always parse the file.
+
+    With a `schema` the values are converted to their types, defaults are
+    filled in and validators are run when the file is loaded. ConfigError is
+    raised for invalid values. Pass a compiled Schema to convert each version
+    of a file only once - a plain dict is compiled on every call. Converted
+    files are kept for as long as their Schema object is alive.
+
+    With `lazy` set the file is only indexed, and a LazyConfig is returned
+    that parses each section on first access. Use it for large files where
+    only a few sections are needed. `cache` does not apply, and ValueError is
+    raised for `as_dict`, `snapshot`, `frozen` and `env_prefix`.
+
+    With `snapshot` set the parsed file is also stored in
+    $XDG_CACHE_HOME/toolboks/config, and later processes load the snapshot
+    instead of parsing the file again as long as its modification time, size
+    and inode are unchanged. Use it for short-lived processes that read large
+    files. Snapshots are not used when `cache` is False.
+
+    With `frozen` set a read-only Config is returned instead, or a read-only
+    mapping view of it if `as_dict` is True. Frozen results are built once per
+    version of a file and shared by all callers; use them when many
+    configurations are kept in memory.
+
+    With `env_prefix` values are overridden by environment variables named
+    <env_prefix>__<SECTION>__<KEY>, e.g. APP__SERVER__PORT=8080 for the port
+    in section server with env_prefix 'APP'. Sections are matched
+    case-insensitively and keys are lowercased. Overrides are applied before
+    the `schema` and cached together with the file.
     """
-    filepath = Path(file)
+    if lazy:
+        for name, value in (
+            ('as_dict', as_dict),
+            ('snapshot', snapshot),
+            ('frozen', frozen),
+            ('env_prefix', env_prefix is not None),
+        ):
+            if value:
+                raise ValueError(f"{name} is not supported with lazy")
 
-    if not filepath.is_file():
-        raise FileNotFoundError("Invalid filename")
+        return LazyConfig(file, schema)
 
-    config_file = configparser.ConfigParser()
-    config_file.read(str(filepath))
+    entry = _load(file, cache, snapshot)
 
-    config = SimpleNamespace()
+    if env_prefix is not None:
+        entry = _with_env(entry, env_prefix)
 
-    for section in config_file.sections():
-        section_nsp = SimpleNamespace()
+    if frozen:
+        config = _frozen(entry, schema)
+        return MappingProxyType(config) if as_dict else config
 
-        for key in config_file[section]:
-            value = config_file[section][key]
-            setattr(section_nsp, key, value)
+    if schema is None:
+        return _build(entry.data, as_dict)
 
-        setattr(config, section, section_nsp)
-        del section_nsp
+    return _build(_typed(entry, schema), as_dict)
 
-    if as_dict:
-        conf_dict = config.__dict__
 
-        for key in conf_dict:
-            if isinstance(conf_dict[key], SimpleNamespace):
-                conf_dict[key] = conf_dict[key].__dict__
+def read_configs(
+    files: Iterable[str],
+    as_dict: bool = False,
+    *,
+    workers: Optional[int] = None,
+    executor: Optional['Executor'] = None,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    return_exceptions: bool = False,
+    snapshot: bool = False,
+    frozen: bool = False,
+    env_prefix: Optional[str] = None
+) -> List[Any]:
+    """
+    Read many configuration files concurrently in a thread pool and return
+    the results of `read_config` in the order of `files`.
+
+    Use it when many small files are loaded and the time is spent waiting
+    for the file system (e.g. network file systems). The files are read on
+    `executor`, on a new pool of `workers` threads if `workers` is given, or
+    else on the thread pool shared through toolboks.system.executor.
 
-        return conf_dict
-    return config
+    An error raised for one file is raised once all files have been read.
+    With `return_exceptions` set the exception is returned in place of the
+    result for that file instead, and the other files are still returned.
+
+    Example:
+    > read_configs(['a.ini', 'missing.ini'], return_exceptions=True)
+    [namespace(main=namespace(name='a')), FileNotFoundError('Invalid filename')]
+    """
+    files = list(files)
+
+    def read(file: str) -> Any:
+        try:
+            return read_config(
+                file,
+                as_dict,
+                cache=cache,
+                schema=schema,
+                snapshot=snapshot,
+                frozen=frozen,
+                env_prefix=env_prefix,
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            if not return_exceptions:
+                raise
+            return error
+
+    if (workers == 1 and executor is None) or len(files) < 2:
+        return [read(file) for file in files]
+
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    from toolboks import system
+
+    if executor is None and workers is not None:
+        with ThreadPoolExecutor(workers, thread_name_prefix='toolboks-config') as pool:
+            futures = [pool.submit(read, file) for file in files]
+    else:
+        pool = executor or system.executor('thread', 'toolboks')
+        futures = [pool.submit(read, file) for file in files]
+        wait(futures)
+
+    return [future.result() for future in futures]
+
+
+async def aread_config(
+    file: str,
+    as_dict: bool = False,
+    *,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    snapshot: bool = False,
+    frozen: bool = False,
+    env_prefix: Optional[str] = None
+) -> Any:
+    """
+    Asynchronous variant of `read_config` for asyncio. The file is read in
+    a thread so the event loop is not blocked.
+    """
+    import asyncio
+
+    return await asyncio.to_thread(
+        read_config,
+        file,
+        as_dict,
+        cache=cache,
+        schema=schema,
+        snapshot=snapshot,
+        frozen=frozen,
+        env_prefix=env_prefix,
+    )
+
+
+async def aread_configs(
+    files: Iterable[str],
+    as_dict: bool = False,
+    *,
+    workers: Optional[int] = None,
+    executor: Optional['Executor'] = None,
+    cache: bool = True,
+    schema: Optional[Union[Schema, Dict]] = None,
+    return_exceptions: bool = False,
+    snapshot: bool = False,
+    frozen: bool = False,
+    env_prefix: Optional[str] = None
+) -> List[Any]:
+    """
+    Asynchronous variant of `read_configs` for asyncio.
+
+    Example:
+    > configs = await aread_configs(paths, return_exceptions=True)
+    """
+    import asyncio
+
+    return await asyncio.to_thread(
+        read_configs,
+        list(files),
+        as_dict,
+        workers=workers,
+        executor=executor,
+        cache=cache,
+        schema=schema,
+        return_exceptions=return_exceptions,
+        snapshot=snapshot,
+        frozen=frozen,
+        env_prefix=env_prefix,
+    )
+
+
+def _candidates(app_name: str, filename: str) -> Tuple[str, ...]:
+    """
+    Return the XDG locations of `filename` for `app_name` in order of
+    increasing precedence: $XDG_CONFIG_DIRS from last to first, followed by
+    $XDG_CONFIG_HOME.
+    """
+    directories = [*reversed(xdg.config_dirs()), xdg.config_home()]
+
+    return tuple(
+        os.path.join(directory, app_name, filename)
+        for directory in directories
+        if directory
+    )
+
+
+def _merge(
+    entries: List[Tuple[str, CacheEntry]]
+) -> Tuple[ConfigData, Dict[str, Dict[str, str]]]:
+    """
+    Merge parsed files in order of increasing precedence and record the file
+    each value came from.
+    """
+    merged: ConfigData = {}
+    sources: Dict[str, Dict[str, str]] = {}
+
+    for path, entry in entries:
+        for section, options in entry.data.items():
+            merged.setdefault(section, {}).update(options)
+            sources.setdefault(section, {}).update(dict.fromkeys(options, path))
+
+    return merged, sources
+
+
+def read_layered(
+    app_name: str,
+    filename: str,
+    as_dict: bool = False,
+    *,
+    schema: Optional[Union[Schema, Dict]] = None
+) -> LayeredConfig:
+    """
+    Read `filename` for `app_name` from all XDG config directories and merge
+    the files into one configuration.
+
+    The candidates are $XDG_CONFIG_DIRS/<app_name>/<filename> and
+    $XDG_CONFIG_HOME/<app_name>/<filename>. A value in $XDG_CONFIG_HOME
+    overrides the same value in $XDG_CONFIG_DIRS, and earlier directories in
+    $XDG_CONFIG_DIRS override later ones. Files that do not exist are skipped.
+
+    All candidates are checked with one stat each and the merged view is
+    cached until one of the files is created, modified or removed. `schema`
+    is applied to the merged values, see `read_config`.
+
+    Example:
+    > layered = read_layered('myapp', 'config.ini')
+    > layered.config.server.port
+    '8080'
+    > layered.sources['server']['port']
+    '/home/user/.config/myapp/config.ini'
+    """
+    candidates = _candidates(app_name, filename)
+    found = []
+
+    for path in candidates:
+        try:
+            found.append(_stat(path))
+        except FileNotFoundError:
+            continue
+
+    signature = tuple(found)
+    key = (app_name, filename, candidates)
+
+    with _layered_lock:
+        cached = _layered.get(key)
+
+    if cached is None or cached[0].signature != signature:
+        merged, sources = _merge([
+            (path, _load_stat(path, file_signature, True))
+            for path, file_signature in found
+        ])
+        files = tuple(path for path, _ in found)
+        cached = (CacheEntry(signature, merged), sources, files)
+
+        with _layered_lock:
+            _layered[key] = cached
+
+    entry, sources, files = cached
+    data = entry.data if schema is None else _typed(entry, schema)
+
+    return LayeredConfig(
+        _build(data, as_dict),
+        {section: dict(keys) for section, keys in sources.items()},
+        files,
+    )
+
+
+# Names of toolboks._watch available from this module, see __getattr__
+_WATCH_NAMES = ('ConfigDiff', 'Watcher', 'awatch', 'diff', 'watch')
+
+
+def __getattr__(name: str):
+    """
+    Return the file watching API on first access. It lives in toolboks._watch
+    so the watcher is only imported when used.
+    """
+    if name in _WATCH_NAMES:
+        from toolboks import _watch
+
+        return getattr(_watch, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -15,10 +15,746 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-from typing import List
+import array
+import sys
+import time
+import types
+from collections import deque
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
+if TYPE_CHECKING:  # pragma: no coverage
+    from concurrent.futures import Executor
 
-def expand(nested_list: List, depth: int = -1) -> List:
+    import numpy
+
+# Module specific pylint instructions
+# pylint: disable=redefined-outer-name
+
+# Iterable built-in containers that can be passed as `containers` to expand
+ITERABLE_TYPES = (list, tuple, set, frozenset, deque, types.GeneratorType)
+
+# Types that are always kept as leaves, even when they match `containers`
+_ATOMIC_TYPES = (str, bytes, bytearray)
+
+# Top-level lists shorter than this are never expanded in parallel
+PARALLEL_MIN_SIZE = 50_000
+
+# Target duration of one chunk of a parallel expansion, in seconds
+PARALLEL_CHUNK_SECONDS = 0.01
+
+# Buffer formats that memoryview can cast and convert to Python objects
+_NATIVE_FORMATS = frozenset('cbB?hHiIlLqQnNfdP')
+
+# array.array typecodes for the values of other single item buffer formats
+_ARRAY_CODES = {**{code: code for code in 'bBhHiIlLqQfd'}, 'e': 'd'}
+
+# Byte order prefix of struct formats that matches this machine
+_NATIVE_ORDER = '<' if sys.byteorder == 'little' else '>'
+
+# Policies for containers that contain themselves, see expand
+_CYCLE_POLICIES = ('raise', 'skip', 'sentinel')
+
+# Nesting level at which the unchecked walk of plain lists looks for cycles
+_CYCLE_CHECK_LEVEL = 64
+
+
+class CycleError(ValueError):
+    """Raised when a nested list contains a reference to itself"""
+
+
+class _Cycle:  # pylint: disable=too-few-public-methods
+    """Placeholder emitted for self references with cycles='sentinel'"""
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return 'CYCLE'
+
+
+CYCLE = _Cycle()
+
+# Entry kinds in the dispatch table
+_LEAF = 0
+_CONTAINER = 1
+_BUFFER = 2
+
+
+def _buffer_types() -> Tuple[type, ...]:
+    """
+    Return the types treated as numeric buffers in buffer-aware mode.
+
+    NumPy is never imported here - if it is not already loaded by the
+    application no ndarray can exist, so it is only checked for when present.
+    """
+    numpy = sys.modules.get('numpy')
+
+    if numpy is not None:
+        return (array.array, memoryview, numpy.ndarray)
+
+    return (array.array, memoryview)
+
+
+def _native_view(view: memoryview) -> Optional[memoryview]:
+    """
+    Return a flat copy of `view` in a native format for a buffer with a byte
+    order prefix or half floats, e.g. '<i' from ctypes. The bytes are only
+    reinterpreted when the layout matches, else the values are unpacked with
+    struct. Return None for formats with several items or without a native
+    type, such buffers are kept as leaves.
+    """
+    import struct  # pylint: disable=import-outside-toplevel
+
+    fmt = view.format
+    code = fmt.lstrip('@=<>!')
+
+    if len(code) != 1 or struct.calcsize(fmt) != view.itemsize:
+        return None
+
+    order = fmt[0].replace('!', '>')
+
+    if (
+        code in _NATIVE_FORMATS
+        and view.itemsize == struct.calcsize(code)
+        and (order not in '<>' or order == _NATIVE_ORDER or view.itemsize == 1)
+    ):
+        return memoryview(view.tobytes()).cast(code)
+
+    if code not in _ARRAY_CODES:
+        return None
+
+    values = [value for value, in struct.iter_unpack(fmt, view.tobytes())]
+
+    return memoryview(array.array(_ARRAY_CODES[code], values))
+
+
+def _flat_view(buffer):
+    """
+    Return a one-dimensional view of `buffer` without copying the data when
+    possible. ndarrays are raveled, other buffers are cast to a flat memoryview.
+    Non-contiguous memoryviews are copied once into a contiguous buffer, and
+    buffers in a format memoryview can not convert are copied by
+    `_native_view`. Return None for a buffer that is kept as a leaf.
+    """
+    numpy = sys.modules.get('numpy')
+
+    if numpy is not None and isinstance(buffer, numpy.ndarray):
+        return numpy.ravel(buffer)
+
+    view = memoryview(buffer)
+
+    if view.format.lstrip('@') not in _NATIVE_FORMATS:
+        return _native_view(view)
+
+    if not view.c_contiguous:
+        return memoryview(view.tobytes()).cast(view.format)
+
+    if view.ndim != 1:
+        view = view.cast('B').cast(view.format)
+
+    return view
+
+
+class _Dispatch(dict):
+    """
+    Per-type dispatch table mapping a type to how entries of that type are
+    handled during expansion: kept as a leaf, walked as a container, or
+    flattened as a numeric buffer.
+
+    The decision is computed on the first lookup of a type and then served
+    from the dict, so the cost per entry stays a single dict lookup no matter
+    how many container types or predicates are configured.
+    """
+    def __init__(
+        self,
+        containers: Tuple[type, ...],
+        is_container: Optional[Callable[[type], bool]],
+        buffers: bool,
+    ):
+        super().__init__()
+        self.containers = containers
+        self.is_container = is_container
+        self.buffers = buffers
+
+    def __missing__(self, cls: type) -> int:
+        if issubclass(cls, _ATOMIC_TYPES):
+            kind = _LEAF
+        elif issubclass(cls, self.containers) or (
+            self.is_container is not None and self.is_container(cls)
+        ):
+            kind = _CONTAINER
+        elif self.buffers and issubclass(cls, _buffer_types()):
+            kind = _BUFFER
+        else:
+            kind = _LEAF
+
+        self[cls] = kind
+        return kind
+
+
+@lru_cache(maxsize=64)
+def _dispatch_table(
+    containers: Tuple[type, ...],
+    is_container: Optional[Callable[[type], bool]],
+    buffers: bool,
+) -> _Dispatch:
+    """Return the shared dispatch table for one combination of options"""
+    return _Dispatch(containers, is_container, buffers)
+
+
+def _dispatch(
+    containers: Iterable[type],
+    is_container: Optional[Callable[[type], bool]],
+    buffers: bool,
+) -> _Dispatch:
+    """Validate the container options and return their dispatch table"""
+    containers = tuple(containers)
+
+    if not all(isinstance(cls, type) for cls in containers):
+        raise TypeError("containers must only contain types")
+
+    return _dispatch_table(containers, is_container, buffers)
+
+
+def _cycle(cycles: str) -> Iterator:
+    """Apply the `cycles` policy to a container found on its own nesting path"""
+    if cycles == 'raise':
+        raise CycleError("Nested list contains a reference to itself")
+
+    if cycles == 'sentinel':
+        yield CYCLE
+
+
+def _iter_leaves(
+    nested_list: Iterable,
+    depth: int,
+    kinds: _Dispatch,
+    blocks: bool = False,
+    cycles: str = 'raise',
+) -> Iterator:
+    """
+    Yield every leaf of `nested_list` in order.
+
+    The nesting is walked with an explicit stack of iterators instead of
+    recursion, so each leaf is produced exactly once no matter how deep it is
+    nested, and deep inputs never hit the interpreter recursion limit.
+    Containers nested deeper than `depth` are yielded as they are.
+
+    The ids of the containers on the current path are kept in a set, so a
+    container that contains itself is handled by the `cycles` policy instead
+    of being walked forever. This costs one set operation per container and
+    nothing per leaf. With a limited `depth` the walk always ends, so the
+    policy only applies when `depth` is -1.
+
+    Numeric buffers count as one level of nesting and their elements are
+    yielded. With `blocks` set the flat view of each buffer is yielded in one
+    piece instead, leaving the elements unboxed.
+    """
+    path = {id(nested_list)}
+    stack = []
+    iterator = iter(nested_list)
+    current = id(nested_list)
+    level = 0
+    descend = depth != 0
+
+    while True:
+        for entry in iterator:
+            if descend:
+                kind = kinds[type(entry)]
+
+                if kind == _CONTAINER:
+                    ident = id(entry)
+
+                    if depth == -1 and ident in path:
+                        yield from _cycle(cycles)
+                        continue
+
+                    path.add(ident)
+                    stack.append((iterator, current))
+                    iterator = iter(entry)
+                    current = ident
+                    level += 1
+                    descend = depth == -1 or level < depth
+                    break
+
+                if kind == _BUFFER:
+                    view = _flat_view(entry)
+
+                    if view is not None:
+                        if blocks:
+                            yield view
+                        else:
+                            yield from view.tolist()
+                        continue
+
+            yield entry
+        else:
+            if not stack:
+                return
+
+            path.discard(current)
+            iterator, current = stack.pop()
+            level -= 1
+            descend = True
+
+
+def _iter_lists(nested_list: Iterable, depth: int) -> Iterator:
+    """
+    Fast path of `_iter_leaves` for the default options, where only lists are
+    expanded and a cycle raises CycleError.
+
+    No path is kept, so a container costs one stack push. Only a cycle or
+    unusually deep input reaches `_CYCLE_CHECK_LEVEL` with unlimited `depth`,
+    and the list found there is checked once by walking it with
+    `_iter_leaves`. Lists can be walked again, so the check does not change
+    the result.
+    """
+    stack = []
+    iterator = iter(nested_list)
+    level = 0
+
+    while True:
+        for entry in iterator:
+            if isinstance(entry, list) and level != depth:
+                level += 1
+
+                if level == _CYCLE_CHECK_LEVEL and depth == -1:
+                    deque(_iter_leaves(entry, -1, _dispatch((list,), None, False)), 0)
+
+                stack.append(iterator)
+                iterator = iter(entry)
+                break
+
+            yield entry
+        else:
+            if not stack:
+                return
+
+            iterator = stack.pop()
+            level -= 1
+
+
+def _iter_leaves_reusing(
+    nested_list: Iterable,
+    depth: int,
+    kinds: _Dispatch,
+    cycles: str = 'raise',
+) -> Iterator:
+    """
+    Variant of `_iter_leaves` that walks every container only once.
+
+    All yielded leaves are recorded, and the position of the leaves of every
+    finished container is kept by id. When the same container is found again
+    at the same level its leaves are copied from the record with one slice
+    instead of being walked again. The containers are kept alive in the index
+    so their ids can not be reused during the walk. A container whose walk
+    ran into the `cycles` policy is not kept, its leaves depend on the path
+    it was reached through.
+    """
+    record: List = []
+    finished: Dict[Tuple[int, int], Tuple[object, int, int]] = {}
+    path = {id(nested_list)}
+    stack = []
+    iterator = iter(nested_list)
+    current = (nested_list, 0)
+    cyclic = False
+    level = 0
+    descend = depth != 0
+
+    while True:
+        for entry in iterator:
+            kind = kinds[type(entry)] if descend else _LEAF
+
+            if kind == _BUFFER:
+                view = _flat_view(entry)
+
+                if view is not None:
+                    leaves = view.tolist()
+                    record.extend(leaves)
+                    yield from leaves
+                    continue
+
+            if kind == _CONTAINER:
+                ident = id(entry)
+
+                if depth == -1 and ident in path:
+                    cyclic = True
+                    for leaf in _cycle(cycles):
+                        record.append(leaf)
+                        yield leaf
+                    continue
+
+                key = (ident, level if depth != -1 else 0)
+
+                if key in finished:
+                    _, start, end = finished[key]
+                    leaves = record[start:end]
+                    record.extend(leaves)
+                    yield from leaves
+                    continue
+
+                path.add(ident)
+                stack.append((iterator, current, cyclic))
+                iterator = iter(entry)
+                current = (entry, len(record))
+                cyclic = False
+                level += 1
+                descend = depth == -1 or level < depth
+                break
+
+            record.append(entry)
+            yield entry
+        else:
+            if not stack:
+                return
+
+            container, start = current
+            path.discard(id(container))
+            iterator, current, parent_cyclic = stack.pop()
+            level -= 1
+            descend = True
+
+            if not cyclic:
+                key = (id(container), level if depth != -1 else 0)
+                finished[key] = (container, start, len(record))
+
+            cyclic = cyclic or parent_cyclic
+
+
+def _iter(
+    nested_list: Iterable,
+    depth: int,
+    containers: Iterable[type],
+    is_container: Optional[Callable[[type], bool]],
+    buffers: bool,
+    cycles: str,
+    shared: str,
+) -> Iterator:
+    """
+    Validate the options and start the walk. The default options take the
+    plain list walk of `_iter_lists`, the dispatch table is only used for
+    other container types, buffers and the cycle and sharing policies.
+    """
+    if cycles not in _CYCLE_POLICIES:
+        raise ValueError(f"Invalid cycles policy: {cycles!r}")
+
+    if shared not in ('expand', 'reuse'):
+        raise ValueError(f"Invalid shared policy: {shared!r}")
+
+    if (
+        containers == (list,)
+        and is_container is None
+        and not buffers
+        and shared == 'expand'
+        and (cycles == 'raise' or depth != -1)
+    ):
+        return _iter_lists(nested_list, depth)
+
+    kinds = _dispatch(containers, is_container, buffers)
+
+    if shared == 'expand':
+        return _iter_leaves(nested_list, depth, kinds, cycles=cycles)
+
+    return _iter_leaves_reusing(nested_list, depth, kinds, cycles)
+
+
+class _Presized:  # pylint: disable=too-few-public-methods
+    """
+    Iterable wrapper that reports the expected number of items through
+    __length_hint__, so list() allocates the result once at the exact size
+    instead of growing it while iterating.
+    """
+    __slots__ = ('iterator', 'size')
+
+    def __init__(self, iterator: Iterator, size: int):
+        self.iterator = iterator
+        self.size = size
+
+    def __iter__(self) -> Iterator:
+        return self.iterator
+
+    def __length_hint__(self) -> int:
+        return self.size
+
+
+def _flatten_with_spec(
+    nested_list: Iterable,
+    depth: int,
+    kinds: _Dispatch,
+) -> Tuple[List, 'StructureSpec']:
+    """
+    Expand `nested_list` like `_iter_leaves` and record its nesting at the
+    same time. See `StructureSpec` for the encoding of the tokens.
+    """
+    leaves: List = []
+    tokens = array.array('q', [0])
+    path = {id(nested_list)}
+    stack = []
+    iterator = iter(nested_list)
+    current = id(nested_list)
+    index = 0
+    entries = 0
+    mark = 0
+    level = 0
+    descend = depth != 0
+
+    while True:
+        for entry in iterator:
+            if descend and kinds[type(entry)] == _CONTAINER:
+                if depth == -1 and id(entry) in path:
+                    raise CycleError("Nested list contains a reference to itself")
+
+                run = len(leaves) - mark
+                if run:
+                    tokens.append(run)
+
+                path.add(id(entry))
+                stack.append((iterator, current, index, entries + run + 1))
+                current = id(entry)
+                index = len(tokens)
+                tokens.append(0)
+                iterator = iter(entry)
+                entries = 0
+                mark = len(leaves)
+                level += 1
+                descend = depth == -1 or level < depth
+                break
+
+            leaves.append(entry)
+        else:
+            run = len(leaves) - mark
+            if run:
+                tokens.append(run)
+
+            tokens[index] = -(entries + run) - 1
+            mark = len(leaves)
+
+            if not stack:
+                return leaves, StructureSpec(tokens, len(leaves))
+
+            path.discard(current)
+            iterator, current, index, entries = stack.pop()
+            level -= 1
+            descend = True
+
+
+def _expand_chunk(chunk: List, options: Tuple) -> Tuple[List, float]:
+    """
+    Expand one chunk of a top-level list in a worker.
+    Return the leaves and the time it took in seconds.
+    """
+    start = time.perf_counter()
+    leaves = list(_iter(chunk, *options))
+
+    return leaves, time.perf_counter() - start
+
+
+def _parallel_pool(
+    workers: Optional[int],
+    executor: Optional['Executor'],
+) -> Tuple['Executor', int]:
+    """
+    Return the executor of a parallel expansion and the number of chunks to
+    expand at a time. Without `executor` the shared process pool of
+    toolboks.system.executor is used, and `workers` is capped at its size.
+    """
+    from toolboks import system  # pylint: disable=import-outside-toplevel
+
+    if executor is None:
+        executor = system.executor('process', 'toolboks')
+        return executor, min(workers or executor.max_workers, executor.max_workers)
+
+    return executor, (
+        workers
+        or getattr(executor, 'max_workers', None)
+        or getattr(executor, '_max_workers', None)
+        or 1
+    )
+
+
+def _expand_parallel(
+    nested_list: Sequence,
+    options: Tuple,
+    workers: int,
+    executor: 'Executor',
+) -> List:
+    """
+    Expand `nested_list` in chunks on `executor` with `workers` chunks
+    running at a time, and join the results in order.
+
+    The first chunks are small. The size of later chunks is adapted from the
+    measured time per entry of finished chunks, aiming at
+    `PARALLEL_CHUNK_SECONDS` per chunk, so cheap flat entries get large chunks
+    and expensive deeply nested entries get small ones. At most two chunks
+    per worker are queued at any time.
+    """
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    total = len(nested_list)
+    chunk_size = max(PARALLEL_MIN_SIZE // (workers * 8), 1)
+    position = 0
+    results: Dict[int, List] = {}
+    pending = {}
+
+    while position < total or pending:
+        while position < total and len(pending) < workers * 2:
+            end = min(position + chunk_size, total)
+            future = executor.submit(
+                _expand_chunk, nested_list[position:end], options
+            )
+            pending[future] = (position, end - position)
+            position = end
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            start, size = pending.pop(future)
+            results[start], seconds = future.result()
+
+            # entries per chunk that take about PARALLEL_CHUNK_SECONDS,
+            # without growing or shrinking more than 4x at a time
+            target = int(size * PARALLEL_CHUNK_SECONDS / max(seconds, 1e-6))
+            chunk_size = min(max(target, chunk_size // 4, 1), chunk_size * 4)
+            chunk_size = min(chunk_size, max(total // workers, 1))
+
+    expanded: List = []
+
+    for start in sorted(results):
+        expanded.extend(results[start])
+
+    return expanded
+
+
+def _iter_unique(leaves: Iterator, key: Optional[Callable]) -> Iterator:
+    """
+    Yield the first occurrence of every leaf in `leaves`, compared by
+    `key(leaf)` when `key` is given.
+
+    Seen values are kept in a set. Unhashable values fall back to a list that
+    is searched by equality, so they cost a linear scan each while hashable
+    values keep the constant time set lookup.
+    """
+    seen: Set = set()
+    add = seen.add
+    unhashable: List = []
+
+    for leaf in leaves:
+        marker = leaf if key is None else key(leaf)
+
+        try:
+            if marker in seen:
+                continue
+            add(marker)
+        except TypeError:
+            if marker in unhashable:
+                continue
+            unhashable.append(marker)
+
+        yield leaf
+
+
+def _fill_array(output: array.array, blocks: Iterator) -> array.array:
+    """
+    Append scalars and flat buffer views from `blocks` to the typed array
+    `output`. Buffers with a matching item type are copied in bulk as raw
+    bytes, other buffers are converted element by element.
+    """
+    typecode = output.typecode
+    numpy = sys.modules.get('numpy')
+
+    for block in blocks:
+        if isinstance(block, memoryview):
+            if block.format == typecode:
+                output.frombytes(block.cast('B'))
+            else:
+                output.extend(block.tolist())
+        elif numpy is not None and isinstance(block, numpy.ndarray):
+            if block.dtype.char != typecode:
+                block = block.astype(typecode)
+            output.frombytes(block.data.cast('B'))
+        else:
+            output.append(block)
+
+    return output
+
+
+def _as_ndarray(output: array.array):
+    """Return a NumPy array sharing memory with the typed array `output`"""
+    import numpy  # pylint: disable=import-outside-toplevel
+
+    return numpy.frombuffer(output, dtype=output.typecode)
+
+
+def iexpand(
+    nested_list: Iterable,
+    depth: int = -1,
+    *,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+    buffers: bool = False,
+    cycles: str = 'raise',
+    shared: str = 'expand',
+) -> Iterator:
+    """
+    Lazy variant of `expand`. Return an iterator that yields the entries of
+    the expanded list one at a time instead of building the whole list.
+
+    Apart from the traversal stack (one iterator per open nesting level) no
+    extra memory is used, and iteration can be stopped at any point.
+
+    Example:
+    > list_of_lists = [1,2,3,4,[5,6,[7,8]]]
+    > next(iexpand(list_of_lists, depth=1))
+    1
+    """
+    if depth < -1:
+        raise ValueError("Invalid depth")
+
+    return _iter(
+        nested_list, depth, containers, is_container, buffers, cycles, shared
+    )
+
+
+def iflatten(
+    *args,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+    buffers: bool = False,
+    cycles: str = 'raise',
+    shared: str = 'expand',
+) -> Iterator:
+    """
+    Lazy variant of `flatten`. Return an iterator over all objects in `args`
+    with any lists and nested lists expanded.
+    """
+    return _iter(args, -1, containers, is_container, buffers, cycles, shared)
+
+
+def expand(
+    nested_list: Iterable,
+    depth: int = -1,
+    *,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+    buffers: bool = False,
+    cycles: str = 'raise',
+    shared: str = 'expand',
+    workers: Optional[int] = None,
+    executor: Optional['Executor'] = None,
+    profile: Optional['NestingProfile'] = None,
+) -> List:
     """
     Expand lists in `nested_list` and return a flat list without sublists.
     All nested sublists will be expanded when no `depth` is given.
@@ -26,6 +762,46 @@ def expand(nested_list: List, depth: int = -1) -> List:
     When `depth` is set, expand will only recurse n times (n=depth).
     Any remaining nested lists at a "higher" depth will remain as nested lists.
 
+    `containers` sets the types that are expanded, default is list only.
+    Pass e.g. `ITERABLE_TYPES` to expand tuples, sets, deques and generators
+    as well. `is_container` is an optional predicate that is called with a
+    type (not an instance) and returns True for additional container types.
+    The decision is made once per type and cached. str, bytes and bytearray
+    are never expanded.
+
+    `cycles` decides what happens when a container contains itself:
+    'raise' (default) raises CycleError, 'skip' leaves the reference out and
+    'sentinel' puts the `CYCLE` placeholder in its place. The policy only
+    applies with unlimited `depth`, a limited depth expands self references
+    like any other container.
+
+    `shared` decides how a container referenced more than once is handled:
+    'expand' (default) walks it again for every reference, 'reuse' walks it
+    once and copies its expanded leaves for later references. 'reuse' keeps
+    the expanded leaves in memory while iterating.
+
+    When `buffers` is True, numeric buffers (array.array, memoryview and NumPy
+    arrays) are expanded into their elements as well. Multi-dimensional
+    buffers are flattened in C order and count as one level of nesting.
+    Buffers with a byte order prefix, e.g. from ctypes, are converted to
+    native values, buffers of structured elements are kept as they are.
+
+    Setting `workers` or `executor` expands large lists in parallel: the
+    top-level list is split into chunks that are expanded by the given
+    concurrent.futures `executor`, or by the process pool shared through
+    toolboks.system.executor, and joined in order. `workers` is the number
+    of chunks expanded at a time, by default the size of the pool and at
+    most the size of the shared pool. Lists shorter than `PARALLEL_MIN_SIZE`
+    and expansions with only one worker are done in the calling thread.
+    Chunks are expanded independently, so cycles through the top-level list
+    and sharing between chunks are handled per chunk. With a process pool
+    `is_container` must be picklable.
+
+    A NestingProfile of `nested_list` (or of any list with the same shape)
+    from `profile()` can be passed as `profile` to allocate the result at its
+    exact size up front. The profile is only used as a size hint, a profile
+    that does not match gives the same result with the usual list growth.
+
     Example:
     > list_of_lists = [1,2,3,4,[5,6,[7,8]]]
     > expand(list_of_lists)
@@ -33,36 +809,422 @@ def expand(nested_list: List, depth: int = -1) -> List:
 
     > expand(list_of_lists, depth=1)
     [1, 2, 3, 4, 5, 6, [7, 8]]
+
+    > expand([1, (2, 3), {4}], containers=(tuple, set))
+    [1, 2, 3, 4]
+    """
+    if workers is not None or executor is not None:
+        if depth < -1:
+            raise ValueError("Invalid depth")
+
+        # validate the options before any chunk is sent to a worker
+        options = (depth, tuple(containers), is_container, buffers, cycles, shared)
+        _dispatch(containers, is_container, buffers)
+
+        if (
+            isinstance(nested_list, (list, tuple))
+            and len(nested_list) >= PARALLEL_MIN_SIZE
+        ):
+            executor, workers = _parallel_pool(workers, executor)
+
+            # one worker is only slower than expanding in this thread
+            if workers > 1:
+                return _expand_parallel(nested_list, options, workers, executor)
+
+    leaves = iexpand(
+        nested_list,
+        depth,
+        containers=containers,
+        is_container=is_container,
+        buffers=buffers,
+        cycles=cycles,
+        shared=shared,
+    )
+
+    if profile is not None:
+        return list(_Presized(leaves, profile.size(depth)))
+
+    return list(leaves)
+
+
+def flatten(
+    *args,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+    buffers: bool = False,
+    cycles: str = 'raise',
+    shared: str = 'expand',
+    profile: Optional['NestingProfile'] = None,
+) -> List:
+    """
+    Flatten any number of lists, nested lists, or objects, into one list.
+    See `expand` for the `containers`, `is_container`, `buffers`, `cycles`
+    and `shared` options. A `profile` must be taken of `list(args)`.
+    """
+    leaves = iflatten(
+        *args,
+        containers=containers,
+        is_container=is_container,
+        buffers=buffers,
+        cycles=cycles,
+        shared=shared,
+    )
+
+    if profile is not None:
+        return list(_Presized(leaves, profile.size()))
+
+    return list(leaves)
+
+
+def iflatten_unique(
+    *args,
+    key: Optional[Callable] = None,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+) -> Iterator:
+    """
+    Lazy variant of `flatten_unique`. Return an iterator over the unique
+    leaves of `args` in the order they are first seen.
+    """
+    return _iter_unique(
+        iflatten(*args, containers=containers, is_container=is_container),
+        key
+    )
+
+
+def flatten_unique(
+    *args,
+    key: Optional[Callable] = None,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+) -> List:
+    """
+    Flatten any number of lists, nested lists, or objects, into one list
+    without duplicates, keeping the order in which leaves are first seen.
+
+    Duplicates are dropped during the traversal with a hash index, so no
+    full-size intermediate list is built. When `key` is given, leaves are
+    compared by `key(leaf)` and the first leaf for each key is kept.
+    Unhashable leaves (or keys) are compared by equality instead.
+
+    Example:
+    > flatten_unique([1, 2, [2, 3]], 3, [[1, 4]])
+    [1, 2, 3, 4]
+
+    > flatten_unique(['a', 'B'], ['b', 'A'], key=str.lower)
+    ['a', 'B']
+    """
+    return list(iflatten_unique(
+        *args,
+        key=key,
+        containers=containers,
+        is_container=is_container,
+    ))
+
+
+def expand_array(
+    nested_list: Iterable,
+    typecode: str = 'd',
+    *,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+    ndarray: bool = False,
+) -> Union[array.array, 'numpy.ndarray']:
+    """
+    Expand `nested_list` completely into a typed array.array with the given
+    `typecode` instead of a list of Python objects.
+
+    Numeric buffers (array.array, memoryview and NumPy arrays) are flattened
+    as part of the nesting. When their item type matches `typecode` their
+    memory is copied in bulk without creating a Python object per element.
+
+    When `ndarray` is True a NumPy array sharing memory with the typed array
+    is returned instead. NumPy must be installed for this option.
+
+    Example:
+    > expand_array([1.5, [array.array('d', [2.5, 3.5])]])
+    array('d', [1.5, 2.5, 3.5])
+    """
+    kinds = _dispatch(containers, is_container, True)
+    output = _fill_array(
+        array.array(typecode),
+        _iter_leaves(nested_list, -1, kinds, blocks=True)
+    )
+
+    return _as_ndarray(output) if ndarray else output
+
+
+def flatten_array(
+    *args,
+    typecode: str = 'd',
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+    ndarray: bool = False,
+) -> Union[array.array, 'numpy.ndarray']:
+    """
+    Flatten any number of numbers, buffers, lists or nested lists into one
+    typed array.array, or into a NumPy array if `ndarray` is True.
+    See `expand_array`.
+    """
+    kinds = _dispatch(containers, is_container, True)
+    output = _fill_array(
+        array.array(typecode),
+        _iter_leaves(args, -1, kinds, blocks=True)
+    )
+
+    return _as_ndarray(output) if ndarray else output
+
+
+class StructureSpec:
+    """
+    Compact, reusable description of the nesting of an expanded list.
+
+    The nesting is stored in pre-order as an array of 64-bit tokens. A
+    negative token -(n + 1) opens a list with n entries, and a positive token
+    k is a run of k consecutive leaves. A flat list of a million numbers is
+    described by two tokens.
+
+    Specs are immutable, hashable and picklable, so one spec can be cached and
+    reused for every batch that shares the same shape.
+    """
+    __slots__ = ('tokens', 'leaf_count')
+
+    def __init__(self, tokens: array.array, leaf_count: int):
+        self.tokens = tokens
+        self.leaf_count = leaf_count
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, StructureSpec):
+            return NotImplemented
+
+        return self.leaf_count == other.leaf_count and self.tokens == other.tokens
+
+    def __hash__(self) -> int:
+        return hash((self.leaf_count, self.tokens.tobytes()))
+
+    def __repr__(self) -> str:
+        return (
+            f"StructureSpec(leaf_count={self.leaf_count}, "
+            f"tokens={len(self.tokens)})"
+        )
+
+
+def flatten_with_spec(
+    nested_list: Iterable,
+    depth: int = -1,
+    *,
+    spec: Optional[StructureSpec] = None,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+) -> Tuple[List, StructureSpec]:
+    """
+    Expand `nested_list` like `expand` and return the leaves together with a
+    StructureSpec that `unflatten` can use to restore the original nesting.
+
+    When a cached `spec` for the same shape is given, the shape analysis is
+    skipped and the leaves are only checked against the leaf count of `spec`.
+
+    Containers of other types than list (see `containers`) are restored as
+    lists by `unflatten`.
+
+    Example:
+    > leaves, spec = flatten_with_spec([1, [2, 3, [4]], 5])
+    > leaves
+    [1, 2, 3, 4, 5]
+    > unflatten([leaf * 10 for leaf in leaves], spec)
+    [10, [20, 30, [40]], 50]
     """
     if depth < -1:
         raise ValueError("Invalid depth")
 
-    expanded_list = []
+    kinds = _dispatch(containers, is_container, False)
 
-    for entry in nested_list:
-        if isinstance(entry, list):
-            if depth == -1:
-                expanded_list.extend(expand(entry))
-            elif depth > 0:
-                expanded_list.extend(expand(entry, depth-1))
-            else:
-                expanded_list.append(entry)
+    if spec is not None:
+        leaves = list(_iter_leaves(nested_list, depth, kinds))
+
+        if len(leaves) != spec.leaf_count:
+            raise ValueError("nested_list does not match the shape of spec")
+
+        return leaves, spec
+
+    return _flatten_with_spec(nested_list, depth, kinds)
+
+
+def unflatten(leaves: Sequence, spec: StructureSpec) -> List:
+    """
+    Rebuild the nesting described by `spec` from the flat sequence `leaves`
+    in one linear pass. Runs of leaves are copied with slices.
+    """
+    if len(leaves) != spec.leaf_count:
+        raise ValueError(
+            f"Expected {spec.leaf_count} leaves, got {len(leaves)}"
+        )
+
+    tokens = spec.tokens
+    root: List = []
+    current = root
+    remaining = -tokens[0] - 1
+    stack = []
+    position = 0
+
+    for index in range(1, len(tokens)):
+        while not remaining:
+            current, remaining = stack.pop()
+
+        token = tokens[index]
+
+        if token > 0:
+            current.extend(leaves[position:position + token])
+            position += token
+            remaining -= token
         else:
-            expanded_list.append(entry)
+            child: List = []
+            current.append(child)
+            stack.append((current, remaining - 1))
+            current = child
+            remaining = -token - 1
 
-    return expanded_list
+    return root
 
 
-def flatten(*args) -> List:
+class NestingProfile:
     """
-    Flatten any number of lists, nested lists, or objects, into one list.
+    Shape of a nested list as counted by `profile()`.
+
+    Level 0 holds the entries of the list itself, level 1 the entries of its
+    sublists and so on. `leaves[n]` and `containers[n]` are the number of
+    leaves and containers at level n, and `max_depth` is the deepest level
+    with any entries, so a flat list has a max_depth of 0.
+    """
+    __slots__ = ('leaves', 'containers')
+
+    def __init__(self, leaves: Sequence[int], containers: Sequence[int]):
+        self.leaves = tuple(leaves)
+        self.containers = tuple(containers)
+
+    @property
+    def max_depth(self) -> int:
+        """Deepest level that contains any entries"""
+        return max(len(self.leaves) - 1, 0)
+
+    @property
+    def leaf_count(self) -> int:
+        """Total number of leaves at all levels"""
+        return sum(self.leaves)
+
+    @property
+    def container_count(self) -> int:
+        """Total number of containers at all levels"""
+        return sum(self.containers)
+
+    def size(self, depth: int = -1) -> int:
+        """Return the length of the list that `expand(..., depth)` returns"""
+        if depth == -1 or depth >= len(self.leaves):
+            return self.leaf_count
+
+        return sum(self.leaves[:depth + 1]) + self.containers[depth]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, NestingProfile):
+            return NotImplemented
+
+        return self.leaves == other.leaves and self.containers == other.containers
+
+    def __hash__(self) -> int:
+        return hash((self.leaves, self.containers))
+
+    def __repr__(self) -> str:
+        return (
+            f"NestingProfile(max_depth={self.max_depth}, "
+            f"leaf_count={self.leaf_count}, "
+            f"container_count={self.container_count})"
+        )
+
+
+def profile(
+    nested_list: Iterable,
+    *,
+    max_depth: int = -1,
+    containers: Iterable[type] = (list,),
+    is_container: Optional[Callable[[type], bool]] = None,
+    buffers: bool = False,
+) -> NestingProfile:
+    """
+    Count the leaves and containers per nesting level of `nested_list` in one
+    traversal and return them as a NestingProfile. Use the same container
+    options as for `expand`.
+
+    With `max_depth` set, a ValueError is raised as soon as a container is
+    found at level `max_depth`, before the rest of the input is walked. This
+    makes it cheap to reject pathologically deep inputs.
+    Containers that contain themselves raise a CycleError. Note that
+    generators used as containers are consumed by the traversal.
+
+    Example:
+    > shape = profile([1, 2, [3, [4, 5]]])
+    > shape.max_depth, shape.leaves, shape.containers
+    (2, (2, 1, 2), (1, 1, 0))
+    > expand(batch_with_the_same_shape, profile=shape)
     """
-    flattened_list = []
+    if max_depth < -1:
+        raise ValueError("Invalid max_depth")
+
+    kinds = _dispatch(containers, is_container, buffers)
+    leaves = [0]
+    counts = [0]
+    path = {id(nested_list)}
+    stack = []
+    iterator = iter(nested_list)
+    current = id(nested_list)
+    level = 0
+
+    while True:
+        for entry in iterator:
+            kind = kinds[type(entry)]
+
+            if kind == _BUFFER:
+                view = _flat_view(entry)
 
-    for arg in args:
-        if isinstance(arg, list):
-            flattened_list.extend(expand(arg))
+                if view is None:
+                    kind = _LEAF
+
+            if kind == _LEAF:
+                leaves[level] += 1
+                continue
+
+            counts[level] += 1
+
+            if level == max_depth:
+                raise ValueError(f"Nesting is deeper than max_depth {max_depth}")
+
+            if len(leaves) == level + 1:
+                leaves.append(0)
+                counts.append(0)
+
+            if kind == _BUFFER:
+                leaves[level + 1] += len(view)
+                continue
+
+            if id(entry) in path:
+                raise CycleError("Nested list contains a reference to itself")
+
+            path.add(id(entry))
+            stack.append((iterator, current))
+            iterator = iter(entry)
+            current = id(entry)
+            level += 1
+            break
         else:
-            flattened_list.append(arg)
+            if not stack:
+                break
+
+            path.discard(current)
+            iterator, current = stack.pop()
+            level -= 1
+
+    # drop trailing levels that only exist for empty containers
+    while len(leaves) > 1 and not leaves[-1] and not counts[-1]:
+        leaves.pop()
+        counts.pop()
 
-    return flattened_list
+    return NestingProfile(leaves, counts)
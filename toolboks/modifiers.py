@@ -16,6 +16,35 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 import os
+import re
+from datetime import timedelta
+from typing import List
+
+# Values accepted by parse_bool, same as configparser.ConfigParser.getboolean
+BOOLEAN_STATES = {
+    '1': True, 'yes': True, 'true': True, 'on': True,
+    '0': False, 'no': False, 'false': False, 'off': False,
+}
+
+# Seconds per unit accepted by parse_duration
+DURATION_UNITS = {
+    'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800,
+}
+
+_DURATION_PART = re.compile(r'\s*(\d+(?:\.\d*)?|\.\d+)\s*([a-z]*)', re.IGNORECASE)
+
+# Bytes per unit accepted by parse_size. Single letters and IEC units (KiB)
+# are binary, SI units (kB) are decimal.
+SIZE_UNITS = {
+    '': 1, 'b': 1,
+    'k': 1024, 'kib': 1024, 'kb': 1000,
+    'm': 1024 ** 2, 'mib': 1024 ** 2, 'mb': 1000 ** 2,
+    'g': 1024 ** 3, 'gib': 1024 ** 3, 'gb': 1000 ** 3,
+    't': 1024 ** 4, 'tib': 1024 ** 4, 'tb': 1000 ** 4,
+    'p': 1024 ** 5, 'pib': 1024 ** 5, 'pb': 1000 ** 5,
+}
+
+_SIZE = re.compile(r'\s*(\d+(?:\.\d*)?|\.\d+)\s*([a-z]*)\s*', re.IGNORECASE)
 
 
 def filter_abs_path(path_str: str) -> str:
@@ -32,3 +61,93 @@ def filter_abs_path(path_str: str) -> str:
             paths.remove(path)
 
     return ':'.join(paths)
+
+
+def parse_bool(value: str) -> bool:
+    """
+    Return the boolean value of `value`. Accepts the same values as
+    configparser: 1/yes/true/on and 0/no/false/off, in any letter case.
+    Raise ValueError for anything else.
+    """
+    try:
+        return BOOLEAN_STATES[value.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Not a boolean: {value!r}") from None
+
+
+def parse_duration(value: str) -> timedelta:
+    """
+    Return the duration in `value` as a timedelta.
+    A number without unit is seconds. Units can be combined: '1h30m'.
+    Supported units: ms, s, m, h, d, w.
+
+    Example:
+    > parse_duration('90')
+    datetime.timedelta(seconds=90)
+    > parse_duration('1m30s')
+    datetime.timedelta(seconds=90)
+    """
+    seconds = 0.0
+    position = 0
+    text = value.strip()
+
+    if not text:
+        raise ValueError("Empty duration")
+
+    while position < len(text):
+        match = _DURATION_PART.match(text, position)
+
+        if match is None:
+            raise ValueError(f"Not a duration: {value!r}")
+
+        number, unit = match.groups()
+
+        try:
+            seconds += float(number) * DURATION_UNITS[unit.lower() or 's']
+        except KeyError:
+            raise ValueError(f"Unknown duration unit in {value!r}: {unit!r}") from None
+
+        position = match.end()
+
+    return timedelta(seconds=seconds)
+
+
+def parse_size(value: str) -> int:
+    """
+    Return the number of bytes in `value`. A number without unit is bytes.
+    K, M, G, T, P and KiB, MiB, ... are powers of 1024, kB, MB, GB, TB and PB
+    powers of 1000. Units are case-insensitive.
+
+    Example:
+    > parse_size('512M')
+    536870912
+    > parse_size('1.5 kB')
+    1500
+    """
+    match = _SIZE.fullmatch(value)
+
+    if match is None:
+        raise ValueError(f"Not a size: {value!r}")
+
+    number, unit = match.groups()
+
+    try:
+        factor = SIZE_UNITS[unit.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown size unit in {value!r}: {unit!r}") from None
+
+    if '.' in number:
+        return int(float(number) * factor)
+
+    return int(number) * factor
+
+
+def parse_list(value: str, separator: str = ',') -> List[str]:
+    """
+    Split `value` on `separator` and return the stripped, non-blank items.
+
+    Example:
+    > parse_list('a, b,,c')
+    ['a', 'b', 'c']
+    """
+    return [item.strip() for item in value.split(separator) if item.strip()]
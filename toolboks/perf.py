@@ -0,0 +1,290 @@
+"""
+toolboks - Lightweight library & utility tools
+
+Copyright (C) 2022 Mikael Tranbom
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import functools
+import importlib
+import inspect
+import threading
+import time
+from types import FunctionType, ModuleType
+from typing import Any, Callable, Dict, List
+
+# Opt-in instrumentation of the toolboks public functions.
+#
+# enable() replaces every public function of the modules in MODULES with a
+# timing wrapper, in the module and wherever toolboks imported it by name,
+# and disable() puts the originals back. While disabled nothing is wrapped,
+# so the functions cost exactly what they cost without this module.
+# Set the environment variable TOOLBOKS_PERF to a non-blank value to enable
+# instrumentation when toolboks is imported (see toolboks/__init__.py).
+
+# Modules whose public functions are instrumented
+MODULES = ('config', 'listlib', 'modifiers', 'system', 'xdg')
+
+# Namespaces the wrappers are swapped into, in addition to MODULES
+_NAMESPACES = ('toolboks',)
+
+
+class FunctionStats:
+    """Call statistics of one instrumented function"""
+    __slots__ = ('calls', 'errors', 'total_seconds', 'max_seconds', '_lock')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, failed: bool):
+        """Record one call that took `seconds`"""
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.total_seconds += seconds
+
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+
+    def reset(self):
+        """Set all statistics to zero"""
+        with self._lock:
+            self.calls = self.errors = 0
+            self.total_seconds = self.max_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the statistics as a dict"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'total_seconds': self.total_seconds,
+                'max_seconds': self.max_seconds,
+            }
+
+
+_lock = threading.Lock()
+
+# Statistics by function name, e.g. 'config.read_config'
+_stats: Dict[str, FunctionStats] = {}
+
+# Original function of each installed wrapper
+_wrappers: Dict[Callable, Callable] = {}
+
+
+def _wrap(func: Callable, stats: FunctionStats) -> Callable:
+    """Return a wrapper of `func` that records its calls in `stats`"""
+    perf_counter = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        failed = True
+
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            stats.record(perf_counter() - start, failed)
+
+    return wrapper
+
+
+def _public_functions(module: ModuleType) -> Dict[str, FunctionType]:
+    """
+    Return the public functions defined in `module`. Generators and
+    coroutines are left out, a wrapper would only time their creation.
+    Functions returning an iterator (e.g. iflatten) are timed until they
+    return it.
+    """
+    return {
+        name: value
+        for name, value in vars(module).items()
+        if not name.startswith('_')
+        and isinstance(value, FunctionType)
+        and value.__module__ == module.__name__
+        and not inspect.isgeneratorfunction(value)
+        and not inspect.iscoroutinefunction(value)
+        and not inspect.isasyncgenfunction(value)
+    }
+
+
+def enabled() -> bool:
+    """Return True if instrumentation is enabled"""
+    return bool(_wrappers)
+
+
+def _namespaces() -> List[ModuleType]:
+    """Return the modules in MODULES and _NAMESPACES"""
+    return [
+        importlib.import_module(name)
+        for name in (*(f'toolboks.{module}' for module in MODULES), *_NAMESPACES)
+    ]
+
+
+def enable():
+    """
+    Instrument the public functions of the toolboks modules in MODULES.
+    Calls through a module (toolboks.config.read_config), through the
+    toolboks package and between toolboks modules are counted. References
+    taken with `from toolboks.config import read_config` before enable()
+    keep calling the original function.
+    """
+    with _lock:
+        if _wrappers:
+            return
+
+        namespaces = _namespaces()
+        originals: Dict[int, Callable] = {}
+
+        for module in namespaces[:len(MODULES)]:
+            short_name = module.__name__.rpartition('.')[2]
+
+            for name, func in _public_functions(module).items():
+                stats = _stats.setdefault(f'{short_name}.{name}', FunctionStats())
+                wrapper = _wrap(func, stats)
+                originals[id(func)] = wrapper
+                _wrappers[wrapper] = func
+
+        for namespace in namespaces:
+            for name, value in list(vars(namespace).items()):
+                wrapper = originals.get(id(value))
+
+                if wrapper is not None and _wrappers[wrapper] is value:
+                    setattr(namespace, name, wrapper)
+
+
+def disable():
+    """Remove the instrumentation. Statistics are kept until reset()"""
+    with _lock:
+        if not _wrappers:
+            return
+
+        # the toolboks package binds exported names on first access, so look
+        # for wrappers in all namespaces instead of only the swapped names
+        for namespace in _namespaces():
+            for name, value in list(vars(namespace).items()):
+                if isinstance(value, FunctionType) and value in _wrappers:
+                    setattr(namespace, name, _wrappers[value])
+
+        _wrappers.clear()
+
+
+def reset():
+    """
+    Reset the function statistics and the bytes read. The config cache
+    statistics are reset by toolboks.config.cache_clear.
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    from toolboks import config
+
+    with _lock:
+        for stats in _stats.values():
+            stats.reset()
+
+    with config._counters_lock:
+        for counter in config._counters:
+            config._counters[counter] = 0
+
+
+def _cache_stats(hits: int, misses: int) -> Dict[str, Any]:
+    """Return hits, misses and the hit rate of a cache as a dict"""
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    Return the collected statistics as a dict. Only functions that have been
+    called are included:
+
+    > perf.snapshot()
+    {'enabled': True,
+     'functions': {'config.read_config': {'calls': 3, 'errors': 0,
+                   'total_seconds': 0.0012, 'max_seconds': 0.0010}, ...},
+     'caches': {'config': {'hits': 2, 'misses': 1, 'hit_rate': 0.67}, ...},
+     'bytes_read': 5120}
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    from toolboks import config
+
+    with _lock:
+        functions = {
+            name: stats.as_dict()
+            for name, stats in sorted(_stats.items())
+            if stats.calls
+        }
+
+    with config._counters_lock:
+        counters = dict(config._counters)
+
+    cache = config._cache.info()
+    index_cache = config._index_cache.info()
+
+    return {
+        'enabled': enabled(),
+        'functions': functions,
+        'caches': {
+            'config': _cache_stats(cache.hits, cache.misses),
+            'config_lazy_index': _cache_stats(index_cache.hits, index_cache.misses),
+            'config_snapshot': _cache_stats(
+                counters['snapshot_hits'], counters['snapshot_misses']
+            ),
+        },
+        'bytes_read': counters['bytes_read'],
+    }
+
+
+def prometheus() -> str:
+    """Return the collected statistics in the Prometheus text format"""
+    data = snapshot()
+    functions = data['functions'].items()
+    caches = data['caches'].items()
+    metrics = [
+        ('toolboks_calls_total', 'counter', "Calls of toolboks functions",
+         [(f'function="{name}"', stats['calls']) for name, stats in functions]),
+        ('toolboks_call_errors_total', 'counter',
+         "Calls of toolboks functions that raised an exception",
+         [(f'function="{name}"', stats['errors']) for name, stats in functions]),
+        ('toolboks_call_seconds_total', 'counter',
+         "Time spent in toolboks functions",
+         [(f'function="{name}"', stats['total_seconds']) for name, stats in functions]),
+        ('toolboks_call_seconds_max', 'gauge',
+         "Longest call of toolboks functions",
+         [(f'function="{name}"', stats['max_seconds']) for name, stats in functions]),
+        ('toolboks_cache_hits_total', 'counter', "Hits of toolboks caches",
+         [(f'cache="{name}"', stats['hits']) for name, stats in caches]),
+        ('toolboks_cache_misses_total', 'counter', "Misses of toolboks caches",
+         [(f'cache="{name}"', stats['misses']) for name, stats in caches]),
+        ('toolboks_read_bytes_total', 'counter', "Bytes read by toolboks.config",
+         [('', data['bytes_read'])]),
+    ]
+    lines = []
+
+    for name, kind, description, samples in metrics:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(
+            f'{name}{{{labels}}} {value}' if labels else f'{name} {value}'
+            for labels, value in samples
+        )
+
+    return '\n'.join(lines) + '\n'
@@ -15,46 +15,454 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import math
 import os
-import platform
 import sys
-import types
-from typing import Callable, Optional, overload
+import threading
+from datetime import timedelta
+from functools import cached_property, lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    overload,
+)
 
+from toolboks.modifiers import parse_bool, parse_duration, parse_list, parse_size
 
-def context() -> types.SimpleNamespace:
-    """Information about the current runtime and system environment"""
-    system_context = types.SimpleNamespace()
+# Type of a value returned by the typed getenv functions
+T = TypeVar('T')
 
-    system_context.cpu_count = os.cpu_count()
-    system_context.hostname = platform.node()
-    system_context.machine = platform.machine()
-    system_context.os = sys.platform
-    system_context.platform = platform.platform()
-    system_context.python_binary = sys.executable
-    system_context.python_binary_real = os.path.realpath(sys.executable)
-    system_context.python_implementation = platform.python_implementation()
-    system_context.python_version = platform.python_version()
-    system_context.system = platform.system()
+# cgroup v1 memory limits at or above this value mean no limit
+_UNLIMITED_MEMORY = 2 ** 60
 
-    try:
-        system_context.shell = os.environ['SHELL']
-    except KeyError:
-        system_context.shell = None
 
+def _read(root: str, path: str) -> Optional[str]:
+    """Return the stripped content of `path` below `root`, or None"""
     try:
-        system_context.user = os.environ['USER']
-    except KeyError:
-        system_context.user = None
+        with open(os.path.join(root, path), encoding='utf-8') as file:
+            return file.read().strip()
+    except (OSError, ValueError):
+        return None
 
-    system_context.user_home = os.path.expanduser('~')
 
-    try:
-        system_context.virtual_environment = os.environ['VIRTUAL_ENV']
-    except KeyError:
-        system_context.virtual_environment = None
+def _cgroup_dirs(root: str, controller: str) -> List[str]:
+    """
+    Return the cgroup directories of the current process for `controller`,
+    from its own cgroup up to the root of the hierarchy. An empty
+    `controller` means the cgroup v2 unified hierarchy.
+    """
+    cgroups = _read(root, 'proc/self/cgroup') or ''
+    mount = os.path.join(root, 'sys', 'fs', 'cgroup')
+
+    for line in cgroups.splitlines():
+        _, controllers, path = line.split(':', 2)
+
+        if controller:
+            if controller not in controllers.split(','):
+                continue
+            base = os.path.join(mount, controllers)
+            if not os.path.isdir(base):
+                base = os.path.join(mount, controller)
+        elif controllers:
+            continue
+        else:
+            base = mount
+
+        directory = os.path.join(base, path.lstrip('/'))
+
+        # in a container the own cgroup is often mounted as the root
+        if not os.path.isdir(directory):
+            return [base]
+
+        directories = [directory]
+
+        while directory != base:
+            directory = os.path.dirname(directory)
+            directories.append(directory)
+
+        return directories
+
+    return []
+
+
+def cgroup_cpu_limit(root: str = '/') -> Optional[float]:
+    """
+    Return the number of CPUs the cgroup quota of the current process allows
+    (cpu.max in cgroup v2, cpu.cfs_quota_us in v1), or None without a quota.
+    The lowest quota of the cgroup and its parents applies.
+    """
+    limits = []
+
+    for directory in _cgroup_dirs(root, ''):
+        quota, _, period = (_read(directory, 'cpu.max') or 'max').partition(' ')
+        if quota != 'max' and period:
+            limits.append(int(quota) / int(period))
+
+    if not limits:
+        for directory in _cgroup_dirs(root, 'cpu'):
+            quota = int(_read(directory, 'cpu.cfs_quota_us') or -1)
+            period = int(_read(directory, 'cpu.cfs_period_us') or 0)
+            if quota > 0 and period > 0:
+                limits.append(quota / period)
+
+    return min(limits) if limits else None
+
+
+def cgroup_memory_limit(root: str = '/') -> Optional[int]:
+    """
+    Return the memory limit in bytes of the cgroup of the current process
+    (memory.max in cgroup v2, memory.limit_in_bytes in v1), or None without
+    a limit. The lowest limit of the cgroup and its parents applies.
+    """
+    limits = []
+
+    for directory in _cgroup_dirs(root, ''):
+        limit = _read(directory, 'memory.max')
+        if limit and limit != 'max':
+            limits.append(int(limit))
+
+    if not limits:
+        for directory in _cgroup_dirs(root, 'memory'):
+            limit = int(_read(directory, 'memory.limit_in_bytes') or _UNLIMITED_MEMORY)
+            if limit < _UNLIMITED_MEMORY:
+                limits.append(limit)
+
+    return min(limits) if limits else None
+
+
+def memory_rss(root: str = '/') -> Optional[int]:
+    """
+    Return the resident set size of the current process in bytes from
+    /proc/self/status, or None where it is not available
+    """
+    for line in (_read(root, 'proc/self/status') or '').splitlines():
+        if line.startswith('VmRSS:'):
+            fields = line.split()
+            unit = fields[2].lower() if len(fields) > 2 else ''
+            return int(fields[1]) * (1024 if unit == 'kb' else 1)
+
+    return None
+
+
+class SystemContext:
+    """
+    Information about the current runtime and system environment.
+
+    Each field is computed on first access and cached for the lifetime of
+    the process, so later accesses cost a plain attribute lookup. The
+    environment based fields (shell, user and virtual_environment) and the
+    current usage (load_average, memory_rss) are read on every access. Call
+    `refresh()` to compute the cached fields again; this is done
+    automatically in a child process after fork. The fields are read-only,
+    `as_dict()` returns all of them at once.
+
+    cpu_count is the number of CPUs of the host. effective_cpu_count is the
+    number of CPUs the process can use, limited by its CPU affinity
+    (available_cpus) and its cgroup quota (cpu_limit). `root` is the
+    directory below which /proc and /sys/fs/cgroup are read.
+    """
+    # pylint: disable=missing-function-docstring,import-outside-toplevel
+
+    # Field names, in the order of repr
+    FIELDS = (
+        'available_cpus', 'cpu_count', 'cpu_limit', 'effective_cpu_count',
+        'hostname', 'load_average', 'machine', 'memory_limit', 'memory_rss',
+        'os', 'platform', 'python_binary', 'python_binary_real',
+        'python_implementation', 'python_version', 'shell', 'system', 'user',
+        'user_home', 'virtual_environment',
+    )
+
+    def __init__(self, root: str = '/'):
+        self.root = root
+
+    @cached_property
+    def available_cpus(self) -> Optional[int]:
+        if hasattr(os, 'sched_getaffinity'):
+            return len(os.sched_getaffinity(0))
+        return self.cpu_count
+
+    @cached_property
+    def cpu_limit(self) -> Optional[float]:
+        return cgroup_cpu_limit(self.root)
+
+    @cached_property
+    def effective_cpu_count(self) -> int:
+        count = self.available_cpus or 1
+
+        if self.cpu_limit is not None:
+            count = min(count, math.ceil(self.cpu_limit))
+
+        return max(count, 1)
+
+    @cached_property
+    def memory_limit(self) -> Optional[int]:
+        return cgroup_memory_limit(self.root)
+
+    @property
+    def memory_rss(self) -> Optional[int]:
+        return memory_rss(self.root)
+
+    @property
+    def load_average(self) -> Optional[Tuple[float, float, float]]:
+        try:
+            return os.getloadavg()
+        except (AttributeError, OSError):
+            return None
+
+    @cached_property
+    def cpu_count(self) -> Optional[int]:
+        return os.cpu_count()
+
+    @cached_property
+    def hostname(self) -> str:
+        import platform
+
+        return platform.node()
+
+    @cached_property
+    def machine(self) -> str:
+        import platform
+
+        return platform.machine()
+
+    @cached_property
+    def os(self) -> str:
+        return sys.platform
+
+    @cached_property
+    def platform(self) -> str:
+        import platform
+
+        return platform.platform()
+
+    @cached_property
+    def python_binary(self) -> str:
+        return sys.executable
+
+    @cached_property
+    def python_binary_real(self) -> str:
+        return os.path.realpath(sys.executable)
+
+    @cached_property
+    def python_implementation(self) -> str:
+        import platform
+
+        return platform.python_implementation()
+
+    @cached_property
+    def python_version(self) -> str:
+        import platform
+
+        return platform.python_version()
+
+    @cached_property
+    def system(self) -> str:
+        import platform
+
+        return platform.system()
+
+    @cached_property
+    def user_home(self) -> str:
+        return os.path.expanduser('~')
+
+    @property
+    def shell(self) -> Optional[str]:
+        return os.environ.get('SHELL')
+
+    @property
+    def user(self) -> Optional[str]:
+        return os.environ.get('USER')
+
+    @property
+    def virtual_environment(self) -> Optional[str]:
+        return os.environ.get('VIRTUAL_ENV')
+
+    def __setattr__(self, name: str, value: Any):
+        if name in self.FIELDS:
+            raise AttributeError(f"SystemContext.{name} is read-only")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name: str):
+        if name in self.FIELDS:
+            raise AttributeError(f"SystemContext.{name} is read-only")
+        super().__delattr__(name)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return all fields by name, computing the ones not accessed yet"""
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def refresh(self):
+        """Forget all cached fields, they are computed again on next access"""
+        for name, field in vars(SystemContext).items():
+            if isinstance(field, cached_property):
+                self.__dict__.pop(name, None)
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.FIELDS)
+        return f"SystemContext({fields})"
+
+
+_context = SystemContext()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_context.refresh)
+
+
+def context() -> SystemContext:
+    """
+    Information about the current runtime and system environment.
+    Return the shared SystemContext of the process, see SystemContext.
+    """
+    return _context
+
+
+def recommended_workers(kind: str = 'cpu') -> int:
+    """
+    Return the recommended number of workers for a pool on this system,
+    based on the CPUs the process can actually use (see SystemContext).
+
+    `kind` is 'cpu' for CPU bound work (one worker per effective CPU) or
+    'io' for work that mostly waits, e.g. on files or network (effective
+    CPUs + 4, at most 32, like ThreadPoolExecutor).
+    """
+    cpus = _context.effective_cpu_count
+
+    if kind == 'cpu':
+        return cpus
+
+    if kind == 'io':
+        return min(32, cpus + 4)
+
+    raise ValueError(f"Invalid kind: {kind!r}")
+
+
+# Names of toolboks._executor available from this module, see __getattr__
+_EXECUTOR_NAMES = (
+    'ExecutorStats', 'SharedExecutor', 'executor', 'executor_stats',
+    'shutdown_executors',
+)
+
+
+def __getattr__(name: str):
+    """
+    Return the shared executor API on first access. It lives in
+    toolboks._executor so concurrent.futures is only imported when used.
+    """
+    if name in _EXECUTOR_NAMES:
+        from toolboks import _executor  # pylint: disable=import-outside-toplevel
+
+        return getattr(_executor, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class Environment:
+    """
+    Memoized view of os.environ for getenv.
+
+    The result of each (key, fallback, mod) lookup is remembered together
+    with the raw value it was computed from. A lookup compares the current
+    raw value with the remembered one and only calls `mod` again when the
+    variable changed, so the view never returns stale values.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._memo: Dict[Hashable, Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        key: str,
+        fallback: Optional[str] = '',
+        mod: Optional[Callable[[str], str]] = None
+    ) -> Optional[str]:
+        """Return the value of `key`, see getenv"""
+        raw = os.environ.get(key)
 
-    return system_context
+        if raw is None:
+            return fallback or None
+
+        if mod is None:
+            return raw or fallback or ''
+
+        try:
+            memo_key: Optional[Hashable] = (key, fallback, mod)
+            cached = self._memo.get(memo_key)
+        except TypeError:
+            # unhashable modifier, not memoized
+            memo_key = cached = None
+
+        if cached is not None and cached[0] == raw:
+            return cached[1]
+
+        value = mod(raw) or fallback or ''
+
+        if memo_key is not None:
+            with self._lock:
+                if len(self._memo) >= self.maxsize:
+                    self._memo.clear()
+                self._memo[memo_key] = (raw, value)
+
+        return value
+
+    def get_parsed(
+        self,
+        key: str,
+        parser: Callable[[str], T],
+        fallback: Optional[T] = None
+    ) -> Optional[T]:
+        """
+        Return the value of `key` converted by `parser`, or `fallback` if the
+        variable does not exist or is blank. The converted value is
+        remembered until the raw value changes, so `parser` runs once per
+        value. ValueError is raised for values `parser` rejects.
+        """
+        raw = os.environ.get(key)
+
+        if raw is None or not raw.strip():
+            return fallback
+
+        memo_key = (key, parser)
+        cached = self._memo.get(memo_key)
+
+        if cached is not None and cached[0] == raw:
+            return cached[1]
+
+        try:
+            value = parser(raw)
+        except ValueError as error:
+            raise ValueError(f"Invalid value for {key}: {error}") from None
+
+        with self._lock:
+            if len(self._memo) >= self.maxsize:
+                self._memo.clear()
+            self._memo[memo_key] = (raw, value)
+
+        return value
+
+    def get_many(
+        self,
+        keys: Mapping[str, Optional[str]],
+        mod: Optional[Callable[[str], str]] = None
+    ) -> Dict[str, Optional[str]]:
+        """Return the values of `keys`, see getenv_many"""
+        return {key: self.get(key, fallback, mod) for key, fallback in keys.items()}
+
+    def clear(self):
+        """Forget all remembered values"""
+        with self._lock:
+            self._memo.clear()
+
+
+# View used by getenv and getenv_many
+environment = Environment()
 
 
 @overload
@@ -122,19 +530,108 @@ def getenv(
     The modifier function must accept one str parameter and return a str.
     The modifier function can be used to filter or modify the value
     from the environment variable. `fallback` will be used if the result of the
-    `mod` function is blank.
+    `mod` function is blank. The result of `mod` is remembered until the
+    environment variable changes (see Environment).
     """
-    try:
-        value = os.environ[key]
+    if mod is None:
+        # nothing to remember without a modifier, skip the Environment memo
+        value = os.environ.get(key)
 
-        value = mod(value) if mod else value
+        if value is None:
+            return fallback or None
 
-        if value:
-            return value
+        return value or fallback or ''
 
-        if fallback:
-            return fallback
+    return environment.get(key, fallback, mod)
+
+
+def getenv_many(
+    keys: Mapping[str, Optional[str]],
+    *,
+    mod: Optional[Callable[[str], str]] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Return the values of many environment variables at once as a dict.
+    `keys` maps each environment variable to its fallback value, and `mod`
+    is applied to every value found, with the same rules as getenv.
+
+    Example:
+    > getenv_many({'XDG_CACHE_HOME': '/home/user/.cache', 'XDG_RUNTIME_DIR': ''})
+    {'XDG_CACHE_HOME': '/home/user/.cache', 'XDG_RUNTIME_DIR': None}
+    """
+    return environment.get_many(keys, mod)
+
+
+def getenv_int(key: str, *, fallback: Optional[int] = None) -> Optional[int]:
+    """
+    Return the value of environment variable `key` as an int, or `fallback`
+    if the environment variable does not exist or has a blank value, like
+    getenv. Raise ValueError if the value is not an integer.
+
+    The parsed value is remembered until the environment variable changes,
+    as for all typed getenv functions.
+
+    Example:
+    $ export WORKERS=8
+    > getenv_int('WORKERS', fallback=4)
+    8
+    """
+    return environment.get_parsed(key, int, fallback)
+
+
+def getenv_bool(key: str, *, fallback: Optional[bool] = None) -> Optional[bool]:
+    """
+    Return the value of environment variable `key` as a bool, or `fallback`
+    if it does not exist or is blank. Accepts 1/yes/true/on and
+    0/no/false/off in any letter case, see modifiers.parse_bool.
+    """
+    return environment.get_parsed(key, parse_bool, fallback)
+
+
+def getenv_bytes(key: str, *, fallback: Optional[int] = None) -> Optional[int]:
+    """
+    Return the size in environment variable `key` in bytes, or `fallback`
+    if it does not exist or is blank. Accepts values like '512M' or '1.5GB',
+    see modifiers.parse_size.
+    """
+    return environment.get_parsed(key, parse_size, fallback)
+
+
+def getenv_duration(
+    key: str,
+    *,
+    fallback: Optional[timedelta] = None
+) -> Optional[timedelta]:
+    """
+    Return the duration in environment variable `key` as a timedelta, or
+    `fallback` if it does not exist or is blank. Accepts values like '30s'
+    or '1h30m', see modifiers.parse_duration.
+    """
+    return environment.get_parsed(key, parse_duration, fallback)
+
+
+@lru_cache(maxsize=None)
+def _list_parser(separator: str) -> Callable[[str], Tuple[str, ...]]:
+    """Return a parser splitting on `separator`, one per separator"""
+    return lambda value: tuple(parse_list(value, separator))
+
+
+def getenv_list(
+    key: str,
+    *,
+    fallback: Optional[List[str]] = None,
+    separator: str = ':'
+) -> Optional[List[str]]:
+    """
+    Return the value of environment variable `key` split on `separator` into
+    a list of stripped, non-blank items, or `fallback` if it does not exist
+    or is blank. The default separator ':' fits path lists like $PATH.
+
+    Example:
+    $ export XDG_DATA_DIRS=/usr/local/share:/usr/share
+    > getenv_list('XDG_DATA_DIRS')
+    ['/usr/local/share', '/usr/share']
+    """
+    items = environment.get_parsed(key, _list_parser(separator))
 
-        return ''
-    except KeyError:
-        return fallback or None
+    return list(items) if items else fallback
@@ -15,9 +15,55 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import asyncio
+import copy
+import gc
+import os
+import pickle
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 import pytest
 
-from toolboks.config import read_config
+from toolboks import _inotify
+from toolboks import config as config_module
+from toolboks.config import (
+    Config,
+    ConfigCache,
+    ConfigError,
+    Field,
+    LazyConfig,
+    Schema,
+    Section,
+    aread_config,
+    aread_configs,
+    awatch,
+    cache_clear,
+    cache_info,
+    invalidate,
+    read_config,
+    read_configs,
+    read_layered,
+    watch,
+)
+
+# Module specific pylint instructions
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    """Fixture for a writable copy of the test configuration file"""
+    cache_clear()
+
+    path = tmp_path / 'config.ini'
+    path.write_text(
+        '[section_1]\na_number = 115\n\n[toolboks]\ntimeout = 5\n',
+        encoding='utf-8'
+    )
+
+    return path
 
 
 def test_read_config():
@@ -48,3 +94,608 @@ def test_read_config_invalid_filename():
     """Test the function config.read_config with an invalid filename"""
     with pytest.raises(FileNotFoundError):
         read_config('toolboks/tests/testdata/invalid_filename_config.ini')
+
+
+def test_read_config_cache(config_file):
+    """Test caching of parsed files in config.read_config"""
+    first = read_config(str(config_file))
+    second = read_config(str(config_file))
+
+    assert first == second
+    assert first is not second
+    assert cache_info().hits == 1
+    assert cache_info().misses == 1
+    assert cache_info().currsize == 1
+
+    # results are independent copies
+    first.section_1.a_number = '0'
+    read_config(str(config_file), as_dict=True)['toolboks']['timeout'] = '0'
+
+    assert read_config(str(config_file)).section_1.a_number == '115'
+    assert read_config(str(config_file), as_dict=True)['toolboks']['timeout'] == '5'
+
+
+def test_read_config_cache_modified(config_file):
+    """Test that config.read_config parses a file again after it changed"""
+    assert read_config(str(config_file)).toolboks.timeout == '5'
+
+    config_file.write_text('[toolboks]\ntimeout = 10\n', encoding='utf-8')
+    file_stat = config_file.stat()
+    os.utime(config_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+
+    assert read_config(str(config_file)).toolboks.timeout == '10'
+    assert cache_info().misses == 2
+
+
+def test_read_config_cache_invalidate(config_file):
+    """Test config.invalidate and config.cache_clear"""
+    read_config(str(config_file))
+
+    assert invalidate(str(config_file)) is True
+    assert invalidate(str(config_file)) is False
+
+    read_config(str(config_file))
+    read_config(str(config_file), cache=False)
+
+    assert cache_info().misses == 2
+    assert cache_info().hits == 0
+
+    cache_clear()
+
+    assert cache_info() == (0, 0, 128, 0)
+
+
+def test_config_cache_lru():
+    """Test LRU eviction in config.ConfigCache"""
+    cache = ConfigCache(maxsize=2)
+
+    cache.put('a', (1, 1, 1), {})
+    cache.put('b', (1, 1, 2), {})
+    assert cache.get('a', (1, 1, 1)).data == {}
+
+    cache.put('c', (1, 1, 3), {})
+
+    assert cache.get('b', (1, 1, 2)) is None
+    assert cache.get('a', (1, 1, 1)).data == {}
+    assert cache.get('a', (2, 1, 1)) is None
+    assert cache.info() == (2, 2, 2, 2)
+
+
+def test_read_config_schema(tmp_path):
+    """Test typed loading with a schema in config.read_config"""
+    path = tmp_path / 'typed.ini'
+    path.write_text(
+        '[server]\nport = 8080\ndebug = yes\nhosts = a, b\ntimeout = 1m30s\n'
+        'name = main\n\n[other]\nvalue = 1\n',
+        encoding='utf-8'
+    )
+    schema = Schema({
+        'server': {
+            'port': Field(int, validator=lambda port: 0 < port < 65536),
+            'debug': bool,
+            'hosts': list,
+            'timeout': timedelta,
+            'ratio': Field(float, default=0.5),
+        },
+        'defaults': {'retries': Field(int, default=3)},
+    })
+
+    config = read_config(str(path), schema=schema)
+
+    assert config.server.port == 8080
+    assert config.server.debug is True
+    assert config.server.hosts == ['a', 'b']
+    assert config.server.timeout == timedelta(seconds=90)
+    assert config.server.ratio == 0.5
+    assert config.server.name == 'main'
+    assert config.other.value == '1'
+    assert config.defaults.retries == 3
+
+    # typed values are converted once per file version and copied per call
+    config.server.hosts.append('c')
+    typed = read_config(str(path), as_dict=True, schema=schema)
+
+    assert typed['server']['hosts'] == ['a', 'b']
+    assert read_config(str(path), schema={'server': {'port': int}}).server.port == 8080
+
+    # typed variants are kept only as long as their Schema
+    entry = config_module._load(str(path), True)  # pylint: disable=protected-access
+    short_lived = Schema({'other': {'value': int}})
+    assert read_config(str(path), schema=short_lived, frozen=True).other.value == 1
+    assert set(entry.schemas) == {schema, short_lived}
+
+    del short_lived
+    gc.collect()
+    assert list(entry.schemas) == [schema]
+
+
+def test_read_config_schema_errors(tmp_path):
+    """Test invalid values with a schema in config.read_config"""
+    path = tmp_path / 'invalid.ini'
+    path.write_text('[server]\nport = http\nworkers = 0\n', encoding='utf-8')
+
+    with pytest.raises(ConfigError, match='server.port'):
+        read_config(str(path), schema={'server': {'port': int}})
+
+    with pytest.raises(ConfigError, match='server.workers'):
+        read_config(str(path), schema={
+            'server': {'workers': Field(int, validator=lambda workers: workers > 0)}
+        })
+
+    with pytest.raises(ConfigError, match='server.missing'):
+        read_config(str(path), schema={'server': {'missing': str}})
+
+
+def test_read_layered(tmp_path, monkeypatch):
+    """Test merging XDG config directories with config.read_layered"""
+    cache_clear()
+
+    system_dir = tmp_path / 'etc'
+    vendor_dir = tmp_path / 'vendor'
+    home_dir = tmp_path / 'home'
+
+    for directory, content in (
+        (vendor_dir, '[app]\nlevel = vendor\nvendor = 1\n[vendor]\nkey = v\n'),
+        (system_dir, '[app]\nlevel = system\nsystem = 1\n'),
+        (home_dir, '[app]\nlevel = home\n'),
+    ):
+        (directory / 'myapp').mkdir(parents=True)
+        (directory / 'myapp' / 'app.ini').write_text(content, encoding='utf-8')
+
+    monkeypatch.setenv('XDG_CONFIG_DIRS', f'{system_dir}:{vendor_dir}')
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(home_dir))
+
+    layered = read_layered('myapp', 'app.ini')
+
+    assert layered.config.app.level == 'home'
+    assert layered.config.app.system == '1'
+    assert layered.config.app.vendor == '1'
+    assert layered.config.vendor.key == 'v'
+    assert layered.sources['app']['level'] == str(home_dir / 'myapp' / 'app.ini')
+    assert layered.sources['app']['vendor'] == str(vendor_dir / 'myapp' / 'app.ini')
+    assert layered.files == tuple(
+        str(directory / 'myapp' / 'app.ini')
+        for directory in (vendor_dir, system_dir, home_dir)
+    )
+
+    # the merged view is reused while no file changes
+    parsed = cache_info()
+    assert read_layered('myapp', 'app.ini', as_dict=True).config['app']['level'] == \
+        'home'
+    assert cache_info() == parsed
+
+    (home_dir / 'myapp' / 'app.ini').unlink()
+
+    layered = read_layered('myapp', 'app.ini', schema={'app': {'system': int}})
+
+    assert layered.config.app.level == 'system'
+    assert layered.config.app.system == 1
+    assert len(layered.files) == 2
+
+
+def test_read_layered_no_files(tmp_path, monkeypatch):
+    """Test config.read_layered without any existing files"""
+    monkeypatch.setenv('XDG_CONFIG_DIRS', str(tmp_path / 'etc'))
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path / 'home'))
+
+    layered = read_layered('myapp', 'app.ini', as_dict=True)
+
+    assert layered.config == {}
+    assert layered.files == ()
+
+
+@pytest.fixture
+def tenants_file(tmp_path):
+    """Fixture for a configuration file with many sections"""
+    cache_clear()
+
+    path = tmp_path / 'tenants.ini'
+    sections = [f'[tenant_{number}]\nquota = {number}\n' for number in range(100)]
+    path.write_text(
+        '[DEFAULT]\nregion = eu\n\n' + '\n'.join(sections)
+        + '\n[paths]\nhome = %(region)s/home\nnote = first\n  second\n',
+        encoding='utf-8'
+    )
+
+    return path
+
+
+def test_read_config_lazy(tenants_file, monkeypatch):
+    """Test lazy section loading with config.read_config"""
+    parsed = []
+    parse_section = config_module._parse_section  # pylint: disable=protected-access
+
+    def counting_parse_section(path, spans, section):
+        parsed.append(section)
+        return parse_section(path, spans, section)
+
+    monkeypatch.setattr(config_module, '_parse_section', counting_parse_section)
+
+    config = read_config(str(tenants_file), lazy=True)
+
+    assert isinstance(config, LazyConfig)
+    assert len(config) == 101
+    assert config.sections()[:2] == ['tenant_0', 'tenant_1']
+    assert not parsed
+
+    assert config.tenant_42.quota == '42'
+    assert config['tenant_42'] == {'quota': '42', 'region': 'eu'}
+    assert config.paths.home == 'eu/home'
+    assert config.paths.note == 'first\nsecond'
+    assert parsed == ['tenant_42', 'paths']
+
+    # parsed sections are shared by later reads of the same file
+    assert read_config(str(tenants_file), lazy=True).tenant_42.quota == '42'
+    assert parsed == ['tenant_42', 'paths']
+
+    assert dict(config) == read_config(str(tenants_file), as_dict=True)
+
+
+def test_read_config_lazy_headers(tmp_path):
+    """Test that lazy config.read_config finds the section headers of configparser"""
+    cache_clear()
+
+    path = tmp_path / 'headers.ini'
+    path.write_text(
+        '[DEFAULT]\nregion = eu\n'
+        '[first]\nnote = one\n  [not a section]\n'
+        '[second] ; tenant two\nquota = 2\n'
+        '[empty]\n  [third]\nquota = 3\n'
+        '[a] ; b]\nquota = 4\n',
+        encoding='utf-8'
+    )
+
+    config = read_config(str(path), lazy=True)
+
+    assert config.sections() == ['first', 'second', 'empty', 'third', 'a] ; b']
+    assert config['first']['note'] == 'one\n[not a section]'
+    assert config['third'] == {'quota': '3', 'region': 'eu'}
+    assert dict(config) == read_config(str(path), as_dict=True)
+
+
+def test_read_config_lazy_missing(tenants_file, tmp_path):
+    """Test missing sections and files with lazy config.read_config"""
+    config = read_config(str(tenants_file), lazy=True)
+
+    with pytest.raises(KeyError):
+        config['missing']  # pylint: disable=pointless-statement
+
+    with pytest.raises(AttributeError):
+        config.missing  # pylint: disable=pointless-statement
+
+    empty = tmp_path / 'empty.ini'
+    empty.write_text('', encoding='utf-8')
+
+    assert len(read_config(str(empty), lazy=True)) == 0
+
+    with pytest.raises(FileNotFoundError):
+        read_config(str(tmp_path / 'missing.ini'), lazy=True)
+
+    for option in ('as_dict', 'snapshot', 'frozen'):
+        with pytest.raises(ValueError):
+            read_config(str(tenants_file), lazy=True, **{option: True})
+
+
+def test_read_config_lazy_schema_and_changes(tenants_file):
+    """Test lazy config.read_config with a schema and a modified file"""
+    schema = Schema({
+        'tenant_1': {'quota': int},
+        'extra': {'enabled': Field(bool, default=False)},
+    })
+    config = read_config(str(tenants_file), lazy=True, schema=schema)
+
+    assert config.tenant_1.quota == 1
+    assert config.tenant_2.quota == '2'
+    assert config.extra.enabled is False
+
+    tenants_file.write_text('[tenant_1]\nquota = 5\n', encoding='utf-8')
+    file_stat = tenants_file.stat()
+    os.utime(tenants_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+
+    assert read_config(str(tenants_file), lazy=True, schema=schema).tenant_1.quota == 5
+
+    # sections typed by a dict schema are not kept with the cached index
+    for _ in range(3):
+        config = read_config(str(tenants_file), lazy=True, schema={'tenant_1': {}})
+        assert config.tenant_1.quota == '5'
+
+    lazy_entry = config_module._lazy_entry  # pylint: disable=protected-access
+    entry = lazy_entry(str(tenants_file))
+    assert list(entry.variants) == ['tenant_1']
+    assert list(entry.schemas) == [schema]
+
+
+def test_watch_polling(tmp_path):
+    """Test config.watch with stat polling"""
+    path = tmp_path / 'watched.ini'
+    path.write_text('[main]\nname = one\nold = x\n', encoding='utf-8')
+    changes: queue.Queue = queue.Queue()
+
+    def callback(config, diff):
+        changes.put((config, diff))
+
+    with watch(str(path), callback, interval=0.02, debounce=0.02,
+               use_inotify=False) as watcher:
+        assert not watcher.uses_inotify
+
+        path.write_text('[main]\nname = two\nnew = y\n', encoding='utf-8')
+        config, diff = changes.get(timeout=5)
+
+        assert config.main.name == 'two'
+        assert diff == {
+            'main': {'name': ('one', 'two'), 'old': ('x', None), 'new': (None, 'y')}
+        }
+
+        # Same content with a new modification time does not call back
+        path.write_text('[main]\nname = two\nnew = y\n', encoding='utf-8')
+        file_stat = path.stat()
+        os.utime(path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+
+        with pytest.raises(queue.Empty):
+            changes.get(timeout=0.3)
+
+
+@pytest.mark.skipif(not _inotify.available(), reason="inotify not available")
+def test_watch_inotify_rename(tmp_path):
+    """Test config.watch with inotify and saves through a rename"""
+    path = tmp_path / 'watched.ini'
+    changes: queue.Queue = queue.Queue()
+
+    with watch(str(path), lambda *change: changes.put(change),
+               debounce=0.02) as watcher:
+        assert watcher.uses_inotify
+        assert watcher.data == {}
+
+        temporary = tmp_path / 'watched.ini.tmp'
+        temporary.write_text('[main]\nname = one\n', encoding='utf-8')
+        os.replace(temporary, path)
+        config, diff = changes.get(timeout=5)
+
+        assert config.main.name == 'one'
+        assert diff == {'main': {'name': (None, 'one')}}
+
+
+def test_watch_errors(tmp_path, monkeypatch):
+    """Test that config.watch reports errors and keeps running"""
+    path = tmp_path / 'watched.ini'
+    path.write_text('[main]\nname = one\n', encoding='utf-8')
+    errors: queue.Queue = queue.Queue()
+    monkeypatch.setattr('sys.excepthook', lambda *exc_info: errors.put(exc_info[0]))
+
+    def callback(config, _):
+        raise RuntimeError(config.main.name)
+
+    with watch(str(path), callback, interval=0.02, debounce=0.02, use_inotify=False):
+        path.write_text('[main]\nname = two\n', encoding='utf-8')
+        assert errors.get(timeout=5) is RuntimeError
+
+        path.write_text('[main]\nname = three\n', encoding='utf-8')
+        assert errors.get(timeout=5) is RuntimeError
+
+    with pytest.raises(FileNotFoundError):
+        watch(str(tmp_path / 'missing' / 'watched.ini'), callback)
+
+
+@pytest.mark.parametrize('use_inotify', [False, True])
+def test_awatch(tmp_path, use_inotify):
+    """Test config.awatch"""
+    if use_inotify and not _inotify.available():
+        pytest.skip("inotify not available")
+
+    path = tmp_path / 'watched.ini'
+    path.write_text('[main]\nname = one\n', encoding='utf-8')
+
+    async def watch_once():
+        changes = awatch(str(path), interval=0.02, debounce=0.02,
+                         use_inotify=use_inotify)
+        change = asyncio.ensure_future(changes.__anext__())
+        await asyncio.sleep(0.1)
+        path.write_text('[main]\nname = two\n', encoding='utf-8')
+        result = await asyncio.wait_for(change, 5)
+        await changes.aclose()
+        return result
+
+    config, diff = asyncio.run(watch_once())
+
+    assert config.main.name == 'two'
+    assert diff == {'main': {'name': ('one', 'two')}}
+
+
+@pytest.mark.parametrize('workers', [None, 1, 4])
+def test_read_configs(tmp_path, workers):
+    """Test config.read_configs"""
+    paths = []
+
+    for number in range(10):
+        path = tmp_path / f'{number}.ini'
+        path.write_text(f'[main]\nnumber = {number}\n', encoding='utf-8')
+        paths.append(str(path))
+
+    configs = read_configs(paths, workers=workers, schema={'main': {'number': int}})
+
+    assert [config.main.number for config in configs] == list(range(10))
+
+    # a dict schema is not kept with the cached files
+    read_configs(paths[:2], workers=workers, schema={'main': {'number': int}})
+    entry = config_module._load(paths[0], True)  # pylint: disable=protected-access
+    assert not entry.variants
+    assert read_configs(paths[:2], as_dict=True, workers=workers) == [
+        {'main': {'number': '0'}}, {'main': {'number': '1'}}
+    ]
+
+    missing = str(tmp_path / 'missing.ini')
+
+    with pytest.raises(FileNotFoundError):
+        read_configs([paths[0], missing], workers=workers)
+
+    results = read_configs([paths[0], missing, paths[1]], workers=workers,
+                           return_exceptions=True)
+
+    assert results[0].main.number == '0'
+    assert isinstance(results[1], FileNotFoundError)
+    assert results[2].main.number == '1'
+    assert read_configs([], workers=workers) == []
+
+
+def test_aread_configs(config_file, tmp_path, monkeypatch):
+    """Test config.aread_config and config.aread_configs"""
+    missing = str(tmp_path / 'missing.ini')
+
+    async def read():
+        return (
+            await aread_config(str(config_file), as_dict=True),
+            await aread_configs([str(config_file), missing], return_exceptions=True),
+        )
+
+    config, configs = asyncio.run(read())
+
+    assert config == read_config(str(config_file), as_dict=True)
+    assert configs[0] == read_config(str(config_file))
+    assert isinstance(configs[1], FileNotFoundError)
+
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(aread_config(missing))
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('APP__TOOLBOKS__TIMEOUT', '10')
+
+    frozen = asyncio.run(
+        aread_config(str(config_file), frozen=True, env_prefix='APP')
+    )
+
+    cache_clear()
+    with ThreadPoolExecutor(1) as executor:
+        frozen_snapshot, = asyncio.run(aread_configs(
+            [str(config_file)], executor=executor, snapshot=True, frozen=True
+        ))
+
+    assert isinstance(frozen, Config)
+    assert frozen.toolboks.timeout == '10'
+    assert isinstance(frozen_snapshot, Config)
+    assert frozen_snapshot.toolboks.timeout == '5'
+    assert os.listdir(tmp_path / 'cache')
+
+
+def test_read_config_snapshot(config_file, tmp_path, monkeypatch):
+    """Test config.read_config with snapshot"""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    expected = read_config(str(config_file), as_dict=True, cache=False)
+
+    assert read_config(str(config_file), as_dict=True, snapshot=True) == expected
+
+    snapshots = list((tmp_path / 'cache' / 'toolboks' / 'config').iterdir())
+    assert len(snapshots) == 1
+
+    def parse(path):
+        raise AssertionError(f"{path} parsed")
+
+    # A new process (empty memory cache) loads the snapshot
+    cache_clear()
+    with monkeypatch.context() as patch:
+        patch.setattr(config_module, '_parse', parse)
+        assert read_config(str(config_file), as_dict=True, snapshot=True) == expected
+
+    # A modified file is parsed again
+    config_file.write_text('[main]\nname = changed\n', encoding='utf-8')
+    file_stat = config_file.stat()
+    os.utime(config_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+
+    assert read_config(str(config_file), snapshot=True).main.name == 'changed'
+
+    # A damaged snapshot is ignored and replaced
+    cache_clear()
+    snapshots[0].write_bytes(b'\0garbage')
+
+    assert read_config(str(config_file), snapshot=True).main.name == 'changed'
+    assert [path.name for path in snapshots[0].parent.iterdir()] == [snapshots[0].name]
+
+
+def test_read_config_frozen(config_file, tmp_path):
+    """Test config.read_config with frozen"""
+    config = read_config(str(config_file), frozen=True)
+    expected = read_config(str(config_file), as_dict=True)
+
+    assert isinstance(config, Config)
+    assert all(isinstance(section, Section) for section in config.values())
+    assert config == expected
+    assert {
+        section: dict(getattr(config, section).items()) for section in config
+    } == expected
+    assert read_config(str(config_file), frozen=True) is config
+    assert pickle.loads(pickle.dumps(config)) == config
+    assert copy.deepcopy(config) == config
+
+    section = next(iter(config.values()))
+
+    with pytest.raises(AttributeError):
+        section.name = 'changed'
+
+    with pytest.raises(AttributeError):
+        config.missing  # pylint: disable=pointless-statement
+
+    with pytest.raises(KeyError):
+        config['missing']  # pylint: disable=pointless-statement
+
+    view = read_config(str(config_file), as_dict=True, frozen=True)
+
+    with pytest.raises(TypeError):
+        view['new'] = {}  # type: ignore[index]
+
+    assert view == expected
+
+
+def test_read_config_frozen_layout(tmp_path):
+    """Test that frozen sections with the same keys share their layout"""
+    paths = []
+
+    for tenant in range(2):
+        path = tmp_path / f'{tenant}.ini'
+        path.write_text(
+            f'[main]\nname = {tenant}\ntags = a, b\n[other]\nname = x\n',
+            encoding='utf-8',
+        )
+        paths.append(str(path))
+
+    schema = Schema({'main': {'tags': list}})
+    first, second = read_configs(paths, frozen=True, schema=schema)
+
+    assert first.main.tags == ('a', 'b')
+    assert second.main.name == '1'
+    assert first['main']['name'] == '0'
+
+    # pylint: disable=protected-access
+    assert first.main._layout is second.main._layout
+    assert first.main._layout is not first.other._layout
+
+
+def test_read_config_env_prefix(tmp_path, monkeypatch):
+    """Test config.read_config with environment overrides"""
+    path = tmp_path / 'app.ini'
+    path.write_text('[Server]\nhost = localhost\nport = 80\n', encoding='utf-8')
+    cache_clear()
+
+    monkeypatch.setenv('APP__SERVER__PORT', '8080')
+    monkeypatch.setenv('APP__LOG__LEVEL', 'debug')
+    monkeypatch.setenv('APP__INVALID', 'ignored')
+    monkeypatch.setenv('OTHER__SERVER__PORT', '1')
+
+    schema = Schema({'Server': {'port': int}})
+    config = read_config(str(path), env_prefix='APP', schema=schema)
+
+    assert config.Server.port == 8080
+    assert config.Server.host == 'localhost'
+    assert config.log.level == 'debug'
+    assert read_config(str(path), as_dict=True) == {
+        'Server': {'host': 'localhost', 'port': '80'}
+    }
+
+    frozen = read_config(str(path), env_prefix='APP', frozen=True)
+    assert read_config(str(path), env_prefix='APP', frozen=True) is frozen
+    assert frozen.Server.port == '8080'
+
+    monkeypatch.setenv('APP__SERVER__PORT', '9090')
+    assert read_config(str(path), env_prefix='APP', frozen=True).Server.port == '9090'
+    assert read_config(str(path), env_prefix='NONE').Server.port == '80'
+
+    with pytest.raises(ValueError):
+        read_config(str(path), env_prefix='APP', lazy=True)
@@ -0,0 +1,101 @@
+"""
+toolboks - Lightweight library & utility tools
+
+Copyright (C) 2022 Mikael Tranbom
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+import toolboks
+
+# Standard library modules that importing toolboks must not load
+HEAVY_MODULES = {
+    'asyncio', 'concurrent.futures', 'configparser', 'ctypes', 'hashlib',
+    'platform', 'tempfile',
+}
+
+
+def imported_modules(code: str) -> set:
+    """Return the modules imported by `code` in a new interpreter, from -X importtime"""
+    environment = {
+        key: value for key, value in os.environ.items() if key != 'TOOLBOKS_PERF'
+    }
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env=environment, capture_output=True, check=True, text=True
+    )
+
+    return {
+        line.rpartition('|')[2].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:')
+    }
+
+
+@pytest.mark.parametrize('code, modules', [
+    ('import toolboks', {'toolboks.config', 'toolboks.listlib', 'toolboks.xdg'}),
+    ('import toolboks; toolboks.expand', {'toolboks.config'}),
+    ('import toolboks; toolboks.read_config', set()),
+    ('import toolboks; toolboks.context().cpu_count', {'toolboks.config'}),
+    ('import toolboks.xdg; toolboks.xdg.cache_home()', set()),
+])
+def test_import_time(code, modules):
+    """Test that importing toolboks does not load heavy modules"""
+    imported = imported_modules(code)
+
+    assert 'toolboks' in imported
+    assert not imported & (HEAVY_MODULES | modules)
+
+
+def test_lazy_submodules():
+    """Test that the submodules of toolboks are imported on attribute access"""
+    code = (
+        'import sys, toolboks; '
+        'names = toolboks._SUBMODULES; '
+        'assert not any(f"toolboks.{name}" in sys.modules for name in names); '
+        'assert all(getattr(toolboks, name) is sys.modules[f"toolboks.{name}"] '
+        'for name in names)'
+    )
+    environment = {
+        key: value for key, value in os.environ.items() if key != 'TOOLBOKS_PERF'
+    }
+
+    subprocess.run([sys.executable, '-c', code], env=environment, check=True)
+
+
+def test_lazy_exports():
+    """Test that the names exported by toolboks are imported on first access"""
+    # pylint: disable=protected-access
+    for name, module in toolboks._EXPORTS.items():
+        value = getattr(importlib.import_module(f'toolboks.{module}'), name)
+
+        assert getattr(toolboks, name) is value
+        assert name in dir(toolboks)
+
+    assert set(toolboks.__all__) == {'__version__', *toolboks._EXPORTS}
+
+    for name in toolboks._SUBMODULES:
+        assert getattr(toolboks, name) is importlib.import_module(f'toolboks.{name}')
+        assert name in dir(toolboks)
+
+    with pytest.raises(AttributeError):
+        toolboks.missing  # pylint: disable=no-member,pointless-statement
+
+    with pytest.raises(ImportError):
+        from toolboks import missing  # noqa: F401 pylint: disable=unused-import
@@ -15,9 +15,32 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import array
+import ctypes
+import pickle
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
-from toolboks.listlib import expand, flatten
+from toolboks import listlib
+from toolboks.system import executor, shutdown_executors
+from toolboks.listlib import (
+    CYCLE,
+    ITERABLE_TYPES,
+    CycleError,
+    expand,
+    expand_array,
+    flatten,
+    flatten_array,
+    flatten_unique,
+    flatten_with_spec,
+    iexpand,
+    iflatten,
+    iflatten_unique,
+    profile,
+    unflatten,
+)
 
 # Module specific pylint instructions
 # pylint: disable=redefined-outer-name
@@ -76,3 +99,404 @@ def test_flatten(nested_lists):
         'Some text', 'More text', 'Even more text',
         412, 500, 600,
     ]
+
+
+def test_expand_deep_nesting():
+    """Test the listlib.expand function with nesting deeper than the recursion limit"""
+    deep_list = [0]
+    for number in range(1, 5000):
+        deep_list = [deep_list, number]
+
+    assert expand(deep_list) == list(range(5000))
+    assert expand(deep_list, depth=4998) == [[0], *range(1, 5000)]
+
+
+def test_expand_empty_sublists():
+    """Test the listlib.expand function with empty sublists"""
+    assert expand([[], [[]], 1, [[], 2]]) == [1, 2]
+    assert expand([[], [[]], 1], depth=1) == [[], 1]
+    assert flatten() == []
+
+
+def test_iexpand(nested_lists):
+    """Test the listlib.iexpand function"""
+    assert list(iexpand(nested_lists)) == expand(nested_lists)
+    assert list(iexpand(nested_lists[0], depth=1)) == expand(nested_lists[0], depth=1)
+
+    leaves = iexpand(nested_lists)
+    assert next(leaves) == 10
+    assert next(leaves) == 14
+
+
+def test_iexpand_invalid_depth(nested_lists):
+    """Test exception for invalid depth in the listlib.iexpand function"""
+    with pytest.raises(ValueError):
+        iexpand(nested_lists, depth=-2)
+
+
+def test_iflatten(nested_lists):
+    """Test the listlib.iflatten function"""
+    assert list(iflatten(nested_lists, 412, [500])) == \
+        flatten(nested_lists, 412, [500])
+    assert list(iflatten()) == []
+
+
+def test_expand_buffers():
+    """Test the listlib.expand function with numeric buffers"""
+    matrix = memoryview(bytearray(range(6))).cast('B', (2, 3))
+    numbers = array.array('i', [7, 8])
+
+    assert expand([1, [matrix, numbers]], buffers=True) == [1, 0, 1, 2, 3, 4, 5, 7, 8]
+    assert expand([1, [numbers]], depth=1, buffers=True) == [1, numbers]
+    assert expand([1, numbers]) == [1, numbers]
+    assert expand(['text', b'bytes', bytearray(b'x')], buffers=True) == \
+        ['text', b'bytes', bytearray(b'x')]
+
+
+def test_expand_buffers_formats():
+    """Test the listlib.expand function with buffers in non-native formats"""
+    numbers = memoryview((ctypes.c_int * 3)(1, 2, 3))
+    matrix = memoryview((ctypes.c_double * 2 * 2)((1.0, 2.0), (3.0, 4.0)))
+    big_endian = memoryview((ctypes.c_short.__ctype_be__ * 3)(1, -2, 3))
+    flags = memoryview((ctypes.c_bool * 2)(True, False))
+
+    class Point(ctypes.Structure):  # pylint: disable=too-few-public-methods
+        """Buffer with two items per element"""
+        _fields_ = [('x', ctypes.c_int), ('y', ctypes.c_int)]
+
+    points = memoryview((Point * 2)())
+
+    assert expand([numbers, matrix], buffers=True) == [1, 2, 3, 1.0, 2.0, 3.0, 4.0]
+    assert expand([big_endian, flags], buffers=True) == [1, -2, 3, True, False]
+    assert expand([numbers], buffers=True, shared='reuse') == [1, 2, 3]
+    assert expand_array([numbers, big_endian], 'i').tolist() == [1, 2, 3, 1, -2, 3]
+    assert profile([matrix], buffers=True).leaves == (0, 4)
+
+    # buffers with several items per element are kept as they are
+    assert expand([points], buffers=True) == [points]
+    assert profile([points], buffers=True).leaves == (1,)
+
+
+def test_flatten_buffers():
+    """Test the listlib.flatten function with numeric buffers"""
+    strided = memoryview(array.array('d', [1.0, 2.0, 3.0, 4.0]))[::2]
+
+    assert flatten(strided, [array.array('d', [5.0])], buffers=True) == [1.0, 3.0, 5.0]
+
+
+def test_expand_array():
+    """Test the listlib.expand_array function"""
+    doubles = array.array('d', [2.0, 3.0])
+    integers = array.array('i', [4, 5])
+
+    result = expand_array([1, [doubles, [integers, memoryview(doubles)]]])
+
+    assert result == array.array('d', [1.0, 2.0, 3.0, 4.0, 5.0, 2.0, 3.0])
+    assert expand_array([[1, 2], 3], typecode='l') == array.array('l', [1, 2, 3])
+    assert flatten_array(1, [doubles], typecode='f') == array.array('f', [1, 2, 3])
+
+    with pytest.raises(TypeError):
+        expand_array([1, ['text']])
+
+
+def test_expand_array_numpy():
+    """Test the listlib.expand_array function with NumPy arrays"""
+    numpy = pytest.importorskip('numpy')
+
+    matrix = numpy.arange(6, dtype='d').reshape(2, 3)
+
+    assert expand([matrix.T], buffers=True) == [0.0, 3.0, 1.0, 4.0, 2.0, 5.0]
+    assert list(expand_array([matrix, [numpy.arange(2, dtype='i')]])) == \
+        [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 0.0, 1.0]
+
+    result = flatten_array(matrix, 6.0, ndarray=True)
+
+    assert isinstance(result, numpy.ndarray)
+    assert result.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+
+
+def test_expand_containers():
+    """Test the listlib.expand function with custom container types"""
+    mixed = [1, (2, [3, deque([4])]), 'text', b'bytes', (number for number in [5, 6])]
+
+    assert expand(mixed, containers=ITERABLE_TYPES) == \
+        [1, 2, 3, 4, 'text', b'bytes', 5, 6]
+    assert expand([1, (2, (3,))], depth=1, containers=(tuple,)) == [1, 2, (3,)]
+    assert expand([1, (2, [3])], containers=(tuple,)) == [1, 2, [3]]
+    assert flatten((1, 2), [3], containers=(tuple, list)) == [1, 2, 3]
+
+
+def test_expand_is_container():
+    """Test the listlib.expand function with a container predicate"""
+    class Bag:  # pylint: disable=too-few-public-methods
+        """Minimal user defined container"""
+        def __init__(self, *items):
+            self.items = items
+
+        def __iter__(self):
+            return iter(self.items)
+
+    checked = []
+
+    def is_bag(cls):
+        checked.append(cls)
+        return cls is Bag
+
+    assert expand([Bag(1, Bag(2)), Bag(3), 4, 5], is_container=is_bag) == \
+        [1, 2, 3, 4, 5]
+    assert checked == [Bag, int]
+
+    # str and bytes are never expanded
+    assert list(iflatten('ab', b'cd', is_container=lambda cls: True)) == ['ab', b'cd']
+
+
+def test_expand_invalid_containers():
+    """Test exception for invalid container types in the listlib.expand function"""
+    with pytest.raises(TypeError):
+        expand([1, 2], containers=('list',))
+
+
+def test_flatten_with_spec(nested_lists):
+    """Test the listlib.flatten_with_spec and listlib.unflatten functions"""
+    leaves, spec = flatten_with_spec(nested_lists)
+
+    assert leaves == expand(nested_lists)
+    assert spec.leaf_count == len(leaves)
+    assert unflatten(leaves, spec) == nested_lists
+
+    for nested in ([], [[]], [[], [[], [1]], 2, [[[3]]]], [1, 2, 3]):
+        leaves, spec = flatten_with_spec(nested)
+        assert unflatten(leaves, spec) == nested
+
+    # a flat list is described by one token for the list and one for its leaves
+    assert len(flatten_with_spec(list(range(1000)))[1].tokens) == 2
+
+
+def test_flatten_with_spec_depth_and_containers():
+    """Test the listlib.flatten_with_spec function with depth and containers"""
+    leaves, spec = flatten_with_spec([1, [2, [3]]], depth=1)
+
+    assert leaves == [1, 2, [3]]
+    assert unflatten(leaves, spec) == [1, [2, [3]]]
+
+    leaves, spec = flatten_with_spec([1, (2, 3)], containers=(tuple,))
+
+    assert leaves == [1, 2, 3]
+    assert unflatten(leaves, spec) == [1, [2, 3]]
+
+
+def test_flatten_with_spec_reuse():
+    """Test reusing a cached StructureSpec for batches with the same shape"""
+    _, spec = flatten_with_spec([[1, 2], [3, [4]]])
+    cached_spec = pickle.loads(pickle.dumps(spec))
+
+    assert cached_spec == spec
+    assert hash(cached_spec) == hash(spec)
+
+    leaves, same_spec = flatten_with_spec([[5, 6], [7, [8]]], spec=cached_spec)
+
+    assert same_spec is cached_spec
+    assert unflatten([leaf * 2 for leaf in leaves], cached_spec) == \
+        [[10, 12], [14, [16]]]
+
+    with pytest.raises(ValueError):
+        flatten_with_spec([[5, 6]], spec=cached_spec)
+
+    with pytest.raises(ValueError):
+        unflatten([1, 2, 3], cached_spec)
+
+
+def test_expand_cycles():
+    """Test the listlib.expand function with a list that contains itself"""
+    cyclic = [1, [2]]
+    cyclic[1].append(cyclic)
+
+    with pytest.raises(CycleError):
+        expand(cyclic)
+
+    with pytest.raises(CycleError):
+        flatten(1, cyclic)
+
+    with pytest.raises(CycleError):
+        flatten_with_spec(cyclic)
+
+    assert expand(cyclic, cycles='skip') == [1, 2]
+    assert expand(cyclic, cycles='sentinel') == [1, 2, CYCLE]
+    assert expand(cyclic, cycles='sentinel', shared='reuse') == [1, 2, CYCLE]
+
+    # the leaves of a container depend on the path when it runs into a cycle
+    first = [1]
+    second = [first]
+    first.append(second)
+    for policy in ('expand', 'reuse'):
+        assert expand([first, second], cycles='skip', shared=policy) == [1, 1]
+        assert expand([first, second], cycles='sentinel', shared=policy) == \
+            [1, CYCLE, 1, CYCLE]
+
+    # a shared sublist that is not on the nesting path is not a cycle
+    shared = [1, 2]
+    assert expand([shared, [shared]]) == [1, 2, 1, 2]
+
+
+def test_expand_cycles_depth():
+    """Test that a list that contains itself is expanded up to a limited depth"""
+    cyclic = [1]
+    cyclic.append(cyclic)
+
+    assert expand(cyclic, depth=1) == [1, 1, cyclic]
+    assert expand(cyclic, depth=2) == [1, 1, 1, cyclic]
+    assert expand(cyclic, depth=1, cycles='skip') == [1, 1, cyclic]
+    assert expand(cyclic, depth=1, shared='reuse') == [1, 1, cyclic]
+
+    leaves, spec = flatten_with_spec(cyclic, 1)
+    assert leaves == [1, 1, cyclic]
+    assert unflatten(leaves, spec) == [1, [1, cyclic]]
+
+
+def test_expand_shared():
+    """Test the listlib.expand function with shared sublists"""
+    shared = [1, [2, 3]]
+    nested = [shared, shared, [shared, [shared]], 4]
+
+    assert expand(nested, shared='reuse') == expand(nested)
+    for depth in range(4):
+        assert expand(nested, depth=depth, shared='reuse') == \
+            expand(nested, depth=depth)
+
+    # generators can only be walked once, reuse keeps their leaves
+    generator = (number for number in [5, 6])
+    assert expand([generator, generator], containers=ITERABLE_TYPES, shared='reuse') \
+        == [5, 6, 5, 6]
+
+
+def test_expand_invalid_policies():
+    """Test exceptions for invalid cycles and shared policies"""
+    with pytest.raises(ValueError):
+        expand([1], cycles='ignore')
+
+    with pytest.raises(ValueError):
+        iflatten([1], shared='copy')
+
+
+def test_expand_parallel(monkeypatch):
+    """Test the listlib.expand function with a parallel executor"""
+    monkeypatch.setattr(listlib, 'PARALLEL_MIN_SIZE', 100)
+    nested = [[number, [number * 2, [number * 3]]] for number in range(5000)]
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        assert expand(nested, executor=executor) == expand(nested)
+        assert expand(nested, depth=1, executor=executor) == expand(nested, depth=1)
+        assert expand(nested[:50], executor=executor) == expand(nested[:50])
+
+    assert expand(nested, workers=2) == expand(nested)
+    assert expand(nested, workers=1) == expand(nested)
+
+
+def test_expand_parallel_one_worker(monkeypatch):
+    """Test that listlib.expand does not use a pool with one worker"""
+    monkeypatch.setattr(listlib, 'PARALLEL_MIN_SIZE', 100)
+    nested = [[number, [number * 2]] for number in range(500)]
+
+    def fail(*_):
+        raise AssertionError("expanded in parallel")
+
+    monkeypatch.setattr(listlib, '_expand_parallel', fail)
+    shutdown_executors()
+
+    try:
+        executor('process', 'toolboks', max_workers=1)
+        assert expand(nested, workers=4) == expand(nested)
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            assert expand(nested, executor=pool) == expand(nested)
+    finally:
+        shutdown_executors()
+
+
+def test_expand_parallel_invalid_options():
+    """Test exceptions for invalid options in a parallel listlib.expand"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError):
+            expand([1, 2], depth=-2, executor=executor)
+
+        with pytest.raises(TypeError):
+            expand([1, 2], containers=('list',), executor=executor)
+
+
+def test_profile(nested_lists):
+    """Test the listlib.profile function"""
+    shape = profile([1, 2, [3, [4, 5]], [[]]])
+
+    assert shape.max_depth == 2
+    assert shape.leaves == (2, 1, 2)
+    assert shape.containers == (2, 2, 0)
+    assert shape.leaf_count == 5
+    assert shape.container_count == 4
+
+    shape = profile(nested_lists)
+
+    assert shape.leaf_count == len(expand(nested_lists))
+    assert shape.max_depth == 6
+    for depth in range(-1, 9):
+        assert shape.size(depth) == len(expand(nested_lists, depth=depth))
+
+    assert profile([]).max_depth == 0
+    assert profile([(1, 2)], containers=(tuple,)).leaves == (0, 2)
+    assert profile([array.array('d', [1, 2, 3])], buffers=True).leaves == (0, 3)
+
+
+def test_profile_max_depth():
+    """Test rejecting deep inputs with the listlib.profile function"""
+    assert profile([1, [2, [3]]], max_depth=2).max_depth == 2
+
+    with pytest.raises(ValueError):
+        profile([1, [2, [3]]], max_depth=1)
+
+    with pytest.raises(ValueError):
+        profile([1], max_depth=-2)
+
+    cyclic = [1]
+    cyclic.append(cyclic)
+
+    with pytest.raises(CycleError):
+        profile(cyclic)
+
+
+def test_expand_with_profile(nested_lists):
+    """Test the listlib.expand and listlib.flatten functions with a profile"""
+    shape = profile(nested_lists)
+
+    assert expand(nested_lists, profile=shape) == expand(nested_lists)
+    assert expand(nested_lists, depth=2, profile=shape) == \
+        expand(nested_lists, depth=2)
+    assert flatten(*nested_lists, profile=profile(list(nested_lists))) == \
+        flatten(*nested_lists)
+
+    # a profile of another shape is only a wrong size hint
+    assert expand(nested_lists, profile=profile([1])) == expand(nested_lists)
+
+
+def test_flatten_unique(nested_lists):
+    """Test the listlib.flatten_unique function"""
+    assert flatten_unique([1, 2, [2, 3]], 3, [[1, 4]]) == [1, 2, 3, 4]
+    assert flatten_unique(nested_lists, nested_lists[1]) == \
+        list(dict.fromkeys(flatten(nested_lists)))
+    assert flatten_unique(['a', 'B'], ['b', 'A'], key=str.lower) == ['a', 'B']
+    assert flatten_unique((1, 1), (1,), containers=(tuple,)) == [1]
+    assert flatten_unique() == []
+
+
+def test_flatten_unique_unhashable():
+    """Test the listlib.flatten_unique function with unhashable leaves"""
+    leaves = [{'id': 1}, 1, {'id': 1}, {'id': 2}, 1, {2}, {2}]
+
+    assert flatten_unique(leaves) == [{'id': 1}, 1, {'id': 2}, {2}]
+    assert flatten_unique([1, [2, 1]], key=lambda leaf: [leaf]) == [1, 2]
+
+
+def test_iflatten_unique():
+    """Test the listlib.iflatten_unique function"""
+    unique = iflatten_unique([1, 1, [2, [1, 3]]])
+
+    assert next(unique) == 1
+    assert list(unique) == [2, 3]
@@ -15,7 +15,17 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-from toolboks.modifiers import filter_abs_path
+from datetime import timedelta
+
+import pytest
+
+from toolboks.modifiers import (
+    filter_abs_path,
+    parse_bool,
+    parse_duration,
+    parse_list,
+    parse_size,
+)
 
 
 def test_filter_abs_path():
@@ -28,3 +38,49 @@ def test_filter_abs_path():
     assert filter_abs_path(paths_1) == paths_1
     assert filter_abs_path(paths_2) == paths_1
     assert filter_abs_path(paths_3) == paths_1
+
+
+def test_parse_bool():
+    """Test the modifiers.parse_bool function"""
+    assert parse_bool('yes') is True
+    assert parse_bool(' On ') is True
+    assert parse_bool('0') is False
+    assert parse_bool('FALSE') is False
+
+    with pytest.raises(ValueError):
+        parse_bool('maybe')
+
+
+def test_parse_duration():
+    """Test the modifiers.parse_duration function"""
+    assert parse_duration('90') == timedelta(seconds=90)
+    assert parse_duration('1m30s') == timedelta(seconds=90)
+    assert parse_duration('1.5h') == timedelta(hours=1.5)
+    assert parse_duration('250ms') == timedelta(milliseconds=250)
+    assert parse_duration(' 2d ') == timedelta(days=2)
+
+    for invalid in ('', 'soon', '1y', '1m later'):
+        with pytest.raises(ValueError):
+            parse_duration(invalid)
+
+
+def test_parse_list():
+    """Test the modifiers.parse_list function"""
+    assert parse_list('a, b,,c ') == ['a', 'b', 'c']
+    assert parse_list('/usr/bin:/bin', separator=':') == ['/usr/bin', '/bin']
+    assert parse_list('') == []
+
+
+def test_parse_size():
+    """Test the modifiers.parse_size function"""
+    assert parse_size('100') == 100
+    assert parse_size('512M') == 512 * 1024 ** 2
+    assert parse_size('2KiB') == 2048
+    assert parse_size('1.5 kB') == 1500
+    assert parse_size(' 1g ') == 1024 ** 3
+    assert parse_size('3TB') == 3 * 1000 ** 4
+    assert parse_size('123456789012345678901') == 123456789012345678901
+
+    for invalid in ('', 'big', '1X', '-1M', '1 M B'):
+        with pytest.raises(ValueError):
+            parse_size(invalid)
@@ -0,0 +1,124 @@
+"""
+toolboks - Lightweight library & utility tools
+
+Copyright (C) 2022 Mikael Tranbom
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import toolboks
+from toolboks import config, listlib, perf, system, xdg
+
+# Module specific pylint instructions
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+def instrumented():
+    """Enable instrumentation with reset statistics for one test"""
+    config.cache_clear()
+    perf.reset()
+    perf.enable()
+    yield
+    perf.disable()
+    perf.reset()
+
+
+def test_enable_disable():
+    """Test that perf.enable swaps wrappers in and perf.disable restores"""
+    read_config = config.read_config
+    getenv = system.getenv
+
+    assert not perf.enabled()
+
+    perf.enable()
+    perf.enable()
+
+    try:
+        assert perf.enabled()
+        assert config.read_config.__wrapped__ is read_config
+        assert toolboks.read_config is config.read_config
+        assert xdg.getenv is system.getenv
+        assert system.getenv.__wrapped__ is getenv
+        assert not hasattr(config.aread_config, '__wrapped__')
+        assert not hasattr(config.awatch, '__wrapped__')
+    finally:
+        perf.disable()
+
+    assert not perf.enabled()
+    assert config.read_config is read_config
+    assert toolboks.read_config is read_config
+    assert xdg.getenv is getenv
+
+
+def test_snapshot(instrumented, tmp_path):
+    """Test perf.snapshot function"""
+    path = tmp_path / 'test.ini'
+    path.write_text('[main]\nname = test\n', encoding='utf-8')
+
+    config.read_config(str(path))
+    toolboks.read_config(str(path))
+    xdg.cache_home()
+
+    with pytest.raises(FileNotFoundError):
+        config.read_config(str(tmp_path / 'missing.ini'))
+
+    data = perf.snapshot()
+    read_config = data['functions']['config.read_config']
+
+    assert data['enabled']
+    assert read_config['calls'] == 3
+    assert read_config['errors'] == 1
+    assert 0 < read_config['max_seconds'] <= read_config['total_seconds']
+    assert data['functions']['xdg.cache_home']['calls'] == 1
+    assert data['functions']['system.getenv']['calls'] == 1
+    assert 'listlib.flatten' not in data['functions']
+    assert data['caches']['config'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+    assert data['bytes_read'] == path.stat().st_size
+
+    perf.reset()
+    assert perf.snapshot()['functions'] == {}
+    assert perf.snapshot()['bytes_read'] == 0
+
+
+def test_prometheus(instrumented):
+    """Test perf.prometheus function"""
+    listlib.flatten([1, [2, [3]]])
+    text = perf.prometheus()
+
+    assert '# TYPE toolboks_calls_total counter\n' in text
+    assert 'toolboks_calls_total{function="listlib.flatten"} 1\n' in text
+    assert 'toolboks_cache_hits_total{cache="config"} 0\n' in text
+    assert 'toolboks_read_bytes_total 0\n' in text
+    assert text.endswith('\n')
+
+
+def test_environment_variable():
+    """Test enabling instrumentation with $TOOLBOKS_PERF"""
+    code = (
+        "import toolboks; from toolboks import perf;"
+        "toolboks.flatten([[1]]); calls = perf.snapshot()['functions'];"
+        "print(perf.enabled(), calls['listlib.flatten']['calls'])"
+    )
+    environment = {**os.environ, 'TOOLBOKS_PERF': '1'}
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        env=environment, capture_output=True, check=True, text=True
+    )
+
+    assert result.stdout.split() == ['True', '1']
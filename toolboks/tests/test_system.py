@@ -18,8 +18,31 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import os
 import sys
 import platform
+import threading
+from datetime import timedelta
 
-from toolboks.system import context, getenv
+import pytest
+
+from toolboks.system import (
+    Environment,
+    SharedExecutor,
+    SystemContext,
+    cgroup_cpu_limit,
+    cgroup_memory_limit,
+    context,
+    executor,
+    executor_stats,
+    getenv,
+    getenv_bool,
+    getenv_bytes,
+    getenv_duration,
+    getenv_int,
+    getenv_list,
+    getenv_many,
+    memory_rss,
+    recommended_workers,
+    shutdown_executors,
+)
 
 
 def test_context():
@@ -40,6 +63,65 @@ def test_context():
     assert system_context.shell == os.getenv('SHELL')
     assert system_context.user == os.getenv('USER')
     assert system_context.virtual_environment == os.getenv('VIRTUAL_ENV')
+    assert system_context.user_home == os.path.expanduser('~')
+    assert repr(system_context).startswith('SystemContext(available_cpus=')
+
+    fields = system_context.as_dict()
+    assert tuple(fields) == SystemContext.FIELDS
+    assert fields['hostname'] == platform.node()
+
+    with pytest.raises(AttributeError):
+        system_context.hostname = 'other'
+
+    with pytest.raises(AttributeError):
+        del system_context.cpu_count
+
+    assert context().hostname == platform.node()
+
+
+def test_context_lazy(monkeypatch):
+    """Test that system.context computes fields on first access"""
+    calls = []
+
+    def node():
+        calls.append('node')
+        return f'host{len(calls)}'
+
+    monkeypatch.setattr(platform, 'node', node)
+    system_context = SystemContext()
+
+    assert context() is context()
+    assert not calls
+    assert system_context.cpu_count == os.cpu_count()
+    assert not calls
+
+    assert system_context.hostname == 'host1'
+    assert system_context.hostname == 'host1'
+
+    system_context.refresh()
+    assert system_context.hostname == 'host2'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="fork not available")
+def test_context_fork():
+    """Test that system.context is refreshed in a child process"""
+    system_context = context()
+    assert system_context.hostname == platform.node()
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:  # pragma: no coverage
+        os.close(read_end)
+        os.write(write_end, str(sorted(vars(system_context))).encode())
+        os._exit(0)  # pylint: disable=protected-access
+
+    os.close(write_end)
+
+    with os.fdopen(read_end) as pipe:
+        assert pipe.read() == "['root']"
+
+    os.waitpid(pid, 0)
 
 
 def test_context_missing_env_vars(monkeypatch):
@@ -84,3 +166,254 @@ def test_getenv_no_env_vars(monkeypatch):
     monkeypatch.delenv('TB_TEST1', raising=False)
 
     assert getenv('TB_TEST1') is None
+
+
+def test_getenv_memoized(monkeypatch):
+    """Test that system.getenv only calls mod again when the value changes"""
+    calls = []
+
+    def mod(value):
+        calls.append(value)
+        return value.upper()
+
+    monkeypatch.setenv('TB_TEST1', 'first')
+
+    assert getenv('TB_TEST1', mod=mod) == 'FIRST'
+    assert getenv('TB_TEST1', mod=mod) == 'FIRST'
+    assert calls == ['first']
+
+    monkeypatch.setenv('TB_TEST1', 'second')
+    assert getenv('TB_TEST1', mod=mod) == 'SECOND'
+
+    monkeypatch.setenv('TB_TEST1', '')
+    assert getenv('TB_TEST1', fallback='fallback', mod=mod) == 'fallback'
+
+    monkeypatch.delenv('TB_TEST1')
+    assert getenv('TB_TEST1', mod=mod) is None
+    assert calls == ['first', 'second', '']
+
+
+def test_environment(monkeypatch):
+    """Test system.Environment with a bounded memo and unhashable modifiers"""
+    class Upper:  # pylint: disable=too-few-public-methods
+        """Unhashable modifier"""
+        __hash__ = None
+
+        def __call__(self, value):
+            return value.upper()
+
+    environment = Environment(maxsize=2)
+    monkeypatch.setenv('TB_TEST1', 'value')
+
+    assert environment.get('TB_TEST1', mod=Upper()) == 'VALUE'
+
+    for fallback in ('a', 'b', 'c'):
+        assert environment.get('TB_TEST1', fallback) == 'value'
+
+    # values without a modifier are not remembered
+    assert not environment._memo  # pylint: disable=protected-access
+
+    for fallback in ('a', 'b', 'c'):
+        assert environment.get('TB_TEST1', fallback, mod=str.upper) == 'VALUE'
+
+    assert len(environment._memo) <= 2  # pylint: disable=protected-access
+    environment.clear()
+    assert not environment._memo  # pylint: disable=protected-access
+
+
+def test_getenv_many(monkeypatch):
+    """Test system.getenv_many function"""
+    monkeypatch.setenv('TB_TEST1', '/home/toolboks/test')
+    monkeypatch.setenv('TB_TEST2', '')
+    monkeypatch.delenv('TB_TEST3', raising=False)
+
+    assert getenv_many({
+        'TB_TEST1': 'fallback', 'TB_TEST2': 'fallback', 'TB_TEST3': None
+    }) == {
+        'TB_TEST1': '/home/toolboks/test', 'TB_TEST2': 'fallback', 'TB_TEST3': None
+    }
+    assert getenv_many({'TB_TEST1': ''}, mod=str.upper) == {
+        'TB_TEST1': '/HOME/TOOLBOKS/TEST'
+    }
+
+
+def write_files(root, files):
+    """Create `files` (relative path -> content) below `root`"""
+    for path, content in files.items():
+        file = root / path
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(content, encoding='utf-8')
+
+
+def test_cgroup_v2(tmp_path):
+    """Test the cgroup readers with cgroup v2"""
+    write_files(tmp_path, {
+        'proc/self/cgroup': '0::/app.slice/worker\n',
+        'proc/self/status': 'Name:\tpython\nVmRSS:\t  2048 kB\n',
+        'sys/fs/cgroup/cpu.max': 'max 100000\n',
+        'sys/fs/cgroup/app.slice/cpu.max': '150000 100000\n',
+        'sys/fs/cgroup/app.slice/memory.max': '1073741824\n',
+        'sys/fs/cgroup/app.slice/worker/cpu.max': '400000 100000\n',
+        'sys/fs/cgroup/app.slice/worker/memory.max': 'max\n',
+    })
+
+    assert cgroup_cpu_limit(str(tmp_path)) == 1.5
+    assert cgroup_memory_limit(str(tmp_path)) == 1073741824
+    assert memory_rss(str(tmp_path)) == 2048 * 1024
+
+    system_context = SystemContext(str(tmp_path))
+
+    assert system_context.cpu_limit == 1.5
+    assert system_context.effective_cpu_count == min(2, system_context.available_cpus)
+    assert system_context.memory_limit == 1073741824
+
+
+def test_cgroup_v1(tmp_path):
+    """Test the cgroup readers with cgroup v1 and a namespaced cgroup"""
+    write_files(tmp_path, {
+        'proc/self/cgroup': '4:memory:/docker/abc\n2:cpu,cpuacct:/docker/abc\n',
+        'sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us': '50000\n',
+        'sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us': '100000\n',
+        'sys/fs/cgroup/memory/memory.limit_in_bytes': '9223372036854771712\n',
+    })
+
+    assert cgroup_cpu_limit(str(tmp_path)) == 0.5
+    assert cgroup_memory_limit(str(tmp_path)) is None
+    assert memory_rss(str(tmp_path)) is None
+    assert SystemContext(str(tmp_path)).effective_cpu_count == 1
+
+
+def test_cgroup_missing(tmp_path):
+    """Test the cgroup readers without cgroups"""
+    assert cgroup_cpu_limit(str(tmp_path)) is None
+    assert cgroup_memory_limit(str(tmp_path)) is None
+
+    system_context = SystemContext(str(tmp_path))
+    assert system_context.effective_cpu_count == system_context.available_cpus
+
+
+def test_recommended_workers(monkeypatch):
+    """Test system.recommended_workers function"""
+    monkeypatch.setitem(vars(context()), 'effective_cpu_count', 2)
+
+    assert recommended_workers() == 2
+    assert recommended_workers('cpu') == 2
+    assert recommended_workers('io') == 6
+
+    monkeypatch.setitem(vars(context()), 'effective_cpu_count', 64)
+    assert recommended_workers('io') == 32
+
+    with pytest.raises(ValueError):
+        recommended_workers('gpu')
+
+
+def test_executor():
+    """Test system.executor function"""
+    pool = executor('thread', 'test', max_workers=2)
+
+    assert isinstance(pool, SharedExecutor)
+    assert executor('thread', 'test') is pool
+    assert executor('thread', 'other') is not pool
+    assert executor('process', 'test') is not pool
+    assert pool.max_workers == 2
+
+    release = threading.Event()
+    futures = [pool.submit(release.wait, 5) for _ in range(5)]
+    stats = pool.stats()
+
+    assert (stats.submitted, stats.active, stats.queued) == (5, 2, 3)
+    assert stats.utilisation == 1.0
+    assert stats in executor_stats()
+
+    release.set()
+    assert all(future.result() for future in futures)
+    assert list(pool.map(abs, [-1, -2])) == [1, 2]
+
+    # leaving a with block does not shut the shared pool down
+    with executor('thread', 'test') as same:
+        assert same.submit(abs, -3).result() == 3
+    assert pool.submit(abs, -4).result() == 4
+
+    pool.shutdown()
+    assert executor('thread', 'test') is pool
+    assert pool.submit(abs, -5).result() == 5
+
+    # an executor used after shutdown_executors registers itself again
+    shutdown_executors()
+    assert pool.submit(abs, -6).result() == 6
+    assert executor('thread', 'test') is pool
+
+    with pytest.raises(ValueError):
+        executor('fiber')
+
+    shutdown_executors()
+    assert not executor_stats()
+
+
+def test_executor_size(monkeypatch):
+    """Test that system.executor sizes pools from the system context"""
+    monkeypatch.setitem(vars(context()), 'effective_cpu_count', 3)
+
+    assert executor('thread', 'sized').max_workers == 7
+    assert executor('process', 'sized').max_workers == 3
+
+    shutdown_executors()
+
+
+def test_getenv_typed(monkeypatch):
+    """Test the typed system.getenv functions"""
+    monkeypatch.setenv('TB_INT', ' 42 ')
+    monkeypatch.setenv('TB_BOOL', 'yes')
+    monkeypatch.setenv('TB_BYTES', '512M')
+    monkeypatch.setenv('TB_DURATION', '1m30s')
+    monkeypatch.setenv('TB_LIST', '/usr/local/share: /usr/share:')
+    monkeypatch.setenv('TB_BLANK', ' ')
+    monkeypatch.delenv('TB_MISSING', raising=False)
+
+    assert getenv_int('TB_INT') == 42
+    assert getenv_bool('TB_BOOL') is True
+    assert getenv_bytes('TB_BYTES') == 512 * 1024 ** 2
+    assert getenv_duration('TB_DURATION') == timedelta(seconds=90)
+    assert getenv_list('TB_LIST') == ['/usr/local/share', '/usr/share']
+    assert getenv_list('TB_LIST', separator=',') == ['/usr/local/share: /usr/share:']
+
+    assert getenv_int('TB_BLANK', fallback=4) == 4
+    assert getenv_bool('TB_MISSING', fallback=False) is False
+    assert getenv_bytes('TB_MISSING') is None
+    assert getenv_list('TB_MISSING', fallback=['/tmp']) == ['/tmp']
+
+    monkeypatch.setenv('TB_LIST', ':')
+    assert getenv_list('TB_LIST', fallback=['/tmp']) == ['/tmp']
+
+    monkeypatch.setenv('TB_INT', 'many')
+
+    with pytest.raises(ValueError, match='TB_INT'):
+        getenv_int('TB_INT')
+
+    with pytest.raises(TypeError):
+        getenv_int('TB_BLANK', 4)  # pylint: disable=too-many-function-args
+
+
+def test_getenv_typed_memoized(monkeypatch):
+    """Test that typed values are only parsed again when the value changes"""
+    calls = []
+
+    def parser(value):
+        calls.append(value)
+        return int(value)
+
+    environment = Environment()
+    monkeypatch.setenv('TB_INT', '1')
+
+    assert environment.get_parsed('TB_INT', parser) == 1
+    assert environment.get_parsed('TB_INT', parser, 5) == 1
+    assert calls == ['1']
+
+    monkeypatch.setenv('TB_INT', '2')
+    assert environment.get_parsed('TB_INT', parser) == 2
+    assert calls == ['1', '2']
+
+    # a returned list can be changed without changing the remembered value
+    monkeypatch.setenv('TB_LIST', 'a:b')
+    getenv_list('TB_LIST').append('c')
+    assert getenv_list('TB_LIST') == ['a', 'b']
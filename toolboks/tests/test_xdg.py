@@ -84,6 +84,10 @@ def test_cache_home_env(monkeypatch):
 
     assert cache_home() == fake_path
 
+    # the home directory is not looked up when the variable is set
+    monkeypatch.setattr(Path, 'home', None)
+    assert cache_home() == fake_path
+
 
 def test_cache_home_default(monkeypatch):
     """Test the xdg.cache_home function with the env var XDG_CACHE_HOME unset"""
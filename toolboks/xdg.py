@@ -15,7 +15,6 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-import configparser
 from pathlib import Path
 from types import SimpleNamespace
 from typing import List, Optional
@@ -48,11 +47,8 @@ def cache_home() -> str:
     """
     Return value of $XDG_CACHE_HOME or default value '$HOME/.cache'
     """
-    return getenv(
-        'XDG_CACHE_HOME',
-        fallback=f"{user_home() / '.cache'}",
-        mod=filter_abs_path
-    )
+    return getenv('XDG_CACHE_HOME', fallback=None, mod=filter_abs_path) or \
+        str(user_home() / '.cache')
 
 
 def config_dirs() -> List[str]:
@@ -70,11 +66,8 @@ def config_home() -> str:
     """
     Return value of $XDG_CONFIG_HOME or default value '$HOME/.config'
     """
-    return getenv(
-        'XDG_CONFIG_HOME',
-        fallback=f"{user_home() / '.config'}",
-        mod=filter_abs_path
-    )
+    return getenv('XDG_CONFIG_HOME', fallback=None, mod=filter_abs_path) or \
+        str(user_home() / '.config')
 
 
 def data_dirs() -> List[str]:
@@ -92,11 +85,8 @@ def data_home() -> str:
     """
     Return value of $XDG_DATA_HOME or default value '$HOME/.local/share'
     """
-    return getenv(
-        'XDG_DATA_HOME',
-        fallback=f"{user_home() / '.local' / 'share'}",
-        mod=filter_abs_path
-    )
+    return getenv('XDG_DATA_HOME', fallback=None, mod=filter_abs_path) or \
+        str(user_home() / '.local' / 'share')
 
 
 def runtime_dir() -> Optional[str]:
@@ -114,11 +104,8 @@ def state_home() -> str:
     """
     Return value of $XDG_STATE_HOME or default value '$HOME/.local/state'
     """
-    return getenv(
-        'XDG_STATE_HOME',
-        fallback=f"{user_home() / '.local' / 'state'}",
-        mod=filter_abs_path
-    )
+    return getenv('XDG_STATE_HOME', fallback=None, mod=filter_abs_path) or \
+        str(user_home() / '.local' / 'state')
 
 
 def user_dirs() -> Optional[SimpleNamespace]:
@@ -131,6 +118,8 @@ def user_dirs() -> Optional[SimpleNamespace]:
     user_dirs_path = config_home() + '/user-dirs.dirs'
 
     if Path(user_dirs_path).is_file():
+        import configparser  # pylint: disable=import-outside-toplevel
+
         config = configparser.ConfigParser()
         contents = '[user_dirs]\n'
 